@@ -1,27 +1,29 @@
+import asyncio
 import json
 import os
 import time
 import threading
 import sys
 import traceback
-import nest_asyncio
 import random
+from collections import deque
 from datetime import datetime
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QLabel, QPushButton, QFrame, QSplitter, QScrollArea,
                                QTextEdit, QMessageBox, QInputDialog, QProgressBar, QLineEdit,
-                               QCheckBox)
+                               QCheckBox, QFileDialog)
 from PySide6.QtCore import Qt, QSize, Signal, Slot, QThread, QObject
 from PySide6.QtGui import QColor, QPalette, QFont
 
 # Импорт Playwright
-from playwright.sync_api import sync_playwright, Page, Browser, Error, TimeoutError
+from playwright.async_api import Error, TimeoutError
 
-# Применяем патч для поддержки асинхронных операций в разных потоках
-nest_asyncio.apply()
+from browser_pool import WarmBrowserPool
+from playwright_engine import PlaywrightEngine
 
 # Импорт ProxyManager
 from proxy_manager import ProxyManager
+from proxy_store import browser_supports_proxy, parse_proxy_url, proxy_key, write_json_atomic
 
 
 class SimpleGameBot:
@@ -30,24 +32,56 @@ class SimpleGameBot:
     def __init__(self):
         self.accounts_file = "game_accounts.json"
         self.accounts = self.load_accounts()
+        # Аккаунты меняются из потока интерфейса, цикла движка и потоков выбора прокси
+        self.accounts_lock = threading.RLock()
         self.game_url = "https://ru.mlgame.org/"
         self.browsers = {}  # Хранит экземпляры браузеров
         self.pages = {}  # Хранит страницы для каждого аккаунта
-        self.playwright = None
+        self.browser_proxies = {}  # Прокси, через который запущен браузер каждого аккаунта
+        # Один драйвер Playwright на все аккаунты: операции с браузерами выполняются в его цикле событий
+        self.engine = PlaywrightEngine()
         self.minimal_mode = True  # Минимальный режим по умолчанию
+        # Режим нескольких контекстов: аккаунты работают в изолированных контекстах общего Chromium,
+        # а cookies и localStorage хранятся в снимках состояния вместо полного профиля браузера
+        self.multi_context_mode = False
+        self.shared_browsers = {}  # Общие Chromium по (скрытый режим, минимальный режим)
+        self._shared_browser_lock = None  # Создается в цикле событий движка
+        # Пул заранее запущенных скрытых Chromium для обновления серверов и других коротких операций
+        self.warm_pool_enabled = True
+        self.pool_lease_timeout = 5  # Сколько секунд ждать свободный браузер пула, затем обычный запуск
+        self.browser_pool = WarmBrowserPool(self._launch_pool_browser, max_size=3, min_size=1, idle_timeout=300)
+        # Снимок сессии после входа позволяет сразу переходить к списку серверов без формы авторизации
+        self.session_ttl = 24 * 3600  # Секунды; срок жизни cookies сессии тоже учитывается
+        self.proxy_acquire_timeout = 3  # Сколько секунд запуск браузера может ждать прокси из пула
+        # Хеджирование запуска: если вход затянулся, параллельно запускается попытка через другой прокси
+        self.hedged_launch = False
+        self.hedge_percentile = 0.9  # Перцентиль времени прошлых входов, после которого запускается вторая попытка
+        self.hedge_min_delay = 5  # Секунды
+        self.hedge_default_delay = 20  # Пока статистики запусков недостаточно
+        self.max_concurrent_launches = 4  # Сколько аккаунтов запускается одновременно при запуске всех
+        self.launch_times = deque(maxlen=100)  # Время от начала запуска до входа в аккаунт (секунды)
+        # Таймауты операций в браузере подстраиваются под задержку прокси в этих пределах от базовых
+        self.timeout_min_ratio = 0.4
+        self.timeout_max_ratio = 3
         # Инициализируем ProxyManager
         self.proxy_manager = ProxyManager()
+        # Фоновая перепроверка прокси по истечении их TTL (не блокирует интерфейс)
+        self.proxy_manager.start_background_verification()
+        self.proxy_manager.on_quarantine = self._on_proxy_quarantined
 
-    def _get_playwright(self):
-        """Получение экземпляра Playwright с учетом потока выполнения"""
+    def _run(self, coroutine):
+        """Выполнение операции с браузерами в цикле движка Playwright (вызывается из потоков интерфейса)"""
         try:
-            # Создаем новый экземпляр для текущего потока
-            playwright = sync_playwright().start()
-            print("Playwright успешно инициализирован")
-            return playwright
+            return self.engine.run(coroutine)
         except Exception as e:
-            print(f"Ошибка при инициализации Playwright: {e}")
-            return None
+            print(f"Ошибка при выполнении операции Playwright: {e}")
+            return False
+
+    def shutdown(self):
+        """Закрытие всех браузеров и остановка драйвера Playwright"""
+        self.close_all_browsers()
+        self._run(self.browser_pool.close())
+        self.engine.stop()
 
     def load_accounts(self):
         """Загрузка аккаунтов из JSON файла"""
@@ -63,121 +97,343 @@ class SimpleGameBot:
     def save_accounts(self):
         """Сохранение аккаунтов в JSON файл"""
         try:
-            with open(self.accounts_file, 'w', encoding='utf-8') as file:
-                json.dump(self.accounts, file, ensure_ascii=False, indent=2)
+            # Файл заменяется целиком: прерванная запись не оставит обрезанный список аккаунтов
+            with self.accounts_lock:
+                write_json_atomic(self.accounts_file, self.accounts, indent=2)
             return True
         except Exception as e:
             print(f"Ошибка при сохранении аккаунтов: {e}")
             return False
 
-    def create_browser(self, account, headless=False, playwright_instance=None):
-        """Создание браузера Playwright с нужными настройками"""
-        try:
-            # Используем переданный экземпляр Playwright или создаем новый
-            playwright = playwright_instance
-            if playwright is None:
-                playwright = self._get_playwright()
-                if playwright is None:
-                    print("Не удалось инициализировать Playwright")
-                    return None, None, None
-
-            # Определение базового пути приложения
-            if getattr(sys, 'frozen', False):
-                # Путь для скомпилированного приложения
-                base_path = os.path.dirname(sys.executable)
-            else:
-                # Путь для разработки
-                base_path = os.path.dirname(os.path.abspath(__file__))
+    def _report_proxy_result(self, account, stage, success):
+        """Передача результата работы через прокси в ProxyManager"""
+        proxy_url = self.browser_proxies.get(account['username'])
+        if proxy_url:
+            self.proxy_manager.report_proxy_result(proxy_url, stage, success)
 
-            # Настройка на хранение данных для каждого аккаунта в отдельной папке
-            user_data_dir = os.path.join(base_path, f"chrome_data/{account['username']}")
-            os.makedirs(user_data_dir, exist_ok=True)
+    def _report_login_result(self, account, login_result, proxy_url=None):
+        """Передача результата входа в ProxyManager.
+
+        Отклоненный вход (login_result is False, например неверный пароль) не
+        связан с прокси и не учитывается; None - страница не загрузилась.
+        """
+        if login_result is False:
+            return
+        proxy_url = proxy_url or self.browser_proxies.get(account['username'])
+        if proxy_url:
+            self.proxy_manager.report_proxy_result(proxy_url, "login", bool(login_result))
+
+    def _report_server_result(self, account, server_result):
+        """Передача результата входа на сервер в ProxyManager.
+
+        Закрытый или не найденный сервер (server_result is False) не связан с прокси
+        и не учитывается; None - страница не загрузилась.
+        """
+        if server_result is not False:
+            self._report_proxy_result(account, "navigation", bool(server_result))
+
+    @staticmethod
+    def _is_network_error(error):
+        """Ошибка сети или таймаут (возможно, по вине прокси), а не сбой браузера или страницы"""
+        if isinstance(error, TimeoutError):
+            return True
+        message = str(error)
+        return "net::ERR_" in message or "NS_ERROR_" in message
+
+    def _on_proxy_quarantined(self, proxy_url, usernames):
+        """Перераспределение аккаунтов с прокси, ушедшего в карантин.
+
+        Переназначаются только прокси, выданные из пула; прокси, заданный
+        пользователем, остается за аккаунтом (карантин временный).
+        """
+        with self.accounts_lock:
+            changed = False
+            # Назначения учитываются по ходу перераспределения, чтобы аккаунты не получили один и тот же прокси
+            assigned = self._get_pool_assignments()
+            for account in self.accounts:
+                # Прокси аккаунта может быть записан в любом поддерживаемом формате - сравниваем по host:port
+                account_proxy = parse_proxy_url(account.get('proxy') or "")
+                if account_proxy is None or proxy_key(account_proxy) != proxy_key(proxy_url):
+                    continue
+                if account.get('proxy_assigned') != "pool":
+                    print(f"Прокси аккаунта {account['username']} задан вручную и не переназначается")
+                    continue
+                new_proxy = self.proxy_manager.get_least_loaded_proxy(exclude=[proxy_url], assigned=assigned)
+                if new_proxy:
+                    assigned.get(proxy_key(account_proxy), set()).discard(account['username'])
+                    assigned.setdefault(proxy_key(new_proxy), set()).add(account['username'])
+                    account['proxy'] = new_proxy
+                    changed = True
+                    print(f"Аккаунт {account['username']} переведен с прокси {proxy_url} на {new_proxy}")
+                    if account['username'] in usernames:
+                        print(f"Новый прокси будет использован при следующем запуске {account['username']}")
+            if changed:
+                self.save_accounts()
 
-            # Получение случайного User-Agent
-            user_agent = self.proxy_manager.get_random_user_agent()
+    def get_account_identity(self, account):
+        """Постоянные параметры браузера аккаунта: User-Agent, размер окна и предпочтительный прокси.
+
+        Профиль создается при первом запуске и хранится вместе с аккаунтом, чтобы
+        сохраненная в chrome_data сессия не выглядела как вход с нового устройства.
+        """
+        with self.accounts_lock:
+            identity = account.get('identity')
+            if not identity or not identity.get('user_agent'):
+                identity = self.proxy_manager.get_account_profile(account['username'])
+                account['identity'] = identity
+                self.save_accounts()
+            return identity
+
+    def _get_chrome_data_path(self, name):
+        """Путь внутри папки chrome_data рядом с приложением"""
+        # Определение базового пути приложения
+        if getattr(sys, 'frozen', False):
+            # Путь для скомпилированного приложения
+            base_path = os.path.dirname(sys.executable)
+        else:
+            # Путь для разработки
+            base_path = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(base_path, "chrome_data", name)
+
+    def _get_user_data_dir(self, account, suffix=""):
+        """Папка профиля браузера аккаунта"""
+        return self._get_chrome_data_path(f"{account['username']}{suffix}")
+
+    def _get_storage_state_path(self, username):
+        """Файл снимка сессии (cookies и localStorage) аккаунта"""
+        return self._get_chrome_data_path(f"{username}.state.json")
+
+    def _has_valid_session(self, account):
+        """Есть ли у аккаунта снимок сессии, срок которого не истек"""
+        session = account.get('session')
+        return bool(session and session.get('expires', 0) > time.time()
+                    and os.path.exists(self._get_storage_state_path(account['username'])))
+
+    def _invalidate_session(self, account):
+        """Удаление отклоненного или устаревшего снимка сессии"""
+        with self.accounts_lock:
+            if account.pop('session', None) is not None:
+                self.save_accounts()
+        try:
+            os.remove(self._get_storage_state_path(account['username']))
+        except OSError:
+            pass
+
+    def _select_browser_proxy(self, account, headless=False, exclude=(), register=True, reserve_as=None):
+        """Выбор прокси для запуска браузера аккаунта (None - запуск без прокси).
+
+        Выбранный прокси закрепляется за аккаунтом (register) или за ключом
+        reserve_as - например, за отдельной попыткой хеджированного запуска.
+        """
+        identity = self.get_account_identity(account)
+        preferred_proxy = None
+        pinned = False
+        if account.get('proxy'):
+            # Поддерживаются ip:port, ip:port:user:pass и URL (в том числе socks5 и с учетными данными)
+            account_proxy = parse_proxy_url(account['proxy'])
+            if account_proxy is None:
+                print(f"Неверный формат прокси аккаунта {account['username']}: {account['proxy']}")
+            elif not browser_supports_proxy(account_proxy):
+                print(f"Chromium не поддерживает SOCKS5-прокси с паролем аккаунта {account['username']}, "
+                      f"используется прокси из пула")
+            elif account_proxy in exclude:
+                pass
+            elif account.get('proxy_assigned') != "pool":
+                # Без ограничения нагрузки - только прокси, заданный явно
+                preferred_proxy, pinned = account_proxy, True
+            elif self._is_pool_proxy_available(account_proxy):
+                # Прокси, выданный из пула, подчиняется тому же лимиту аккаунтов, что и остальные
+                preferred_proxy = account_proxy
+        elif (identity.get('proxy') and identity['proxy'] not in exclude
+              and self._is_pool_proxy_available(identity['proxy'])):
+            # Без заданного прокси аккаунт по возможности выходит в сеть через тот же прокси, что и раньше,
+            # если его еще не заняли другие аккаунты
+            preferred_proxy = identity['proxy']
+        # Скрытый браузер запускается без прокси, только если прокси аккаунту не задан:
+        # иначе (например, SOCKS5 с паролем) ему подбирается прокси из пула
+        if not preferred_proxy and headless and not account.get('proxy'):
+            return None
+        # Перед запуском проверяем прокси аккаунта вместе с запасными из пула:
+        # при недоступном прокси используется следующий в цепочке, а не полный запуск Chromium.
+        # Если прокси не задан и браузер не в скрытом режиме, используем наименее загруженный из пула.
+        # Пул не обновляется во время запуска: ждем не дольше proxy_acquire_timeout
+        return self.proxy_manager.select_launch_proxy(
+            preferred=preferred_proxy,
+            username=reserve_as or (account['username'] if register and not headless else None),
+            timeout=self.proxy_acquire_timeout,
+            exclude=exclude,
+            pinned=pinned)
+
+    def _is_pool_proxy_available(self, proxy_url):
+        """Прокси не в карантине и на нем есть место для еще одного аккаунта"""
+        return (not self.proxy_manager.is_quarantined(proxy_url)
+                and self.proxy_manager.get_proxy_load(proxy_url) < self.proxy_manager.max_accounts_per_proxy)
+
+    def _get_pool_assignments(self, skip=()):
+        """Прокси из пула, назначенные аккаунтам: host:port -> множество аккаунтов (кроме skip)"""
+        assigned = {}
+        for account in self.accounts:
+            if account.get('proxy_assigned') != "pool" or account['username'] in skip:
+                continue
+            account_proxy = parse_proxy_url(account.get('proxy') or "")
+            if account_proxy is not None:
+                assigned.setdefault(proxy_key(account_proxy), set()).add(account['username'])
+        return assigned
+
+    def _track_browser_proxy(self, account, proxy_url, headless=False):
+        """Учет прокси, через который запущен браузер аккаунта"""
+        # Запоминаем прокси браузера, чтобы сообщать о результатах его работы.
+        # Нагрузку на прокси учитываем только для постоянно работающих браузеров
+        if proxy_url:
+            self.browser_proxies[account['username']] = proxy_url
+            if not headless:
+                self.proxy_manager.register_proxy_use(account['username'], proxy_url)
+            with self.accounts_lock:
+                identity = self.get_account_identity(account)
+                if identity.get('proxy') != proxy_url:
+                    identity['proxy'] = proxy_url
+                    self.save_accounts()
+        else:
+            self.browser_proxies.pop(account['username'], None)
+            self.proxy_manager.release_proxy(account['username'])
+
+    def _get_timeout(self, proxy_url, default, multiplier):
+        """Таймаут операции в браузере (мс) по задержке прокси; без прокси или замеров - default"""
+        if not proxy_url:
+            return default
+        return int(1000 * self.proxy_manager.get_proxy_timeout(
+            proxy_url, multiplier, default=default / 1000,
+            minimum=default * self.timeout_min_ratio / 1000, maximum=default * self.timeout_max_ratio / 1000))
+
+    def _get_browser_args(self):
+        """Аргументы запуска Chromium"""
+        browser_args = [
+            "--start-maximized",
+            "--disable-notifications",
+            "--disable-popup-blocking",
+            "--disable-gpu",
+            "--no-sandbox",
+            "--ignore-certificate-errors",
+            "--ignore-ssl-errors",
+            "--disable-web-security",  # Отключаем проверки безопасности
+            "--disable-features=IsolateOrigins,site-per-process",  # Отключаем изоляцию
+            "--disable-site-isolation-trials",  # Отключаем изоляцию сайтов
+            "--disable-blink-features=AutomationControlled",  # Скрываем автоматизацию
+            "--aggressive-cache-discard",  # Отключаем кэш
+            "--disable-cache",  # Отключаем кэш
+            "--disable-application-cache",  # Отключаем кэш приложений
+            "--disable-infobars",  # Скрываем инфо панели
+            "--window-size=1920,1080",  # Фиксированный размер окна
+            "--lang=ru-RU,ru",  # Устанавливаем русский язык
+            "--disable-extensions",  # Отключаем расширения
+            "--disable-dev-shm-usage",  # Отключаем использование /dev/shm
+            "--disable-accelerated-2d-canvas",  # Отключаем ускорение 2D
+            "--disable-default-apps",  # Отключаем приложения по умолчанию
+            "--no-first-run",  # Отключаем первый запуск
+        ]
+
+        # В минимальном режиме не загружаем изображения и другие ресурсы
+        if self.minimal_mode:
+            browser_args.extend([
+                "--disable-images",
+                "--blink-settings=imagesEnabled=false"
+            ])
+        return browser_args
+
+    async def create_browser(self, account, headless=False, proxy=None, user_data_dir=None, track=True,
+                             pooled=False):
+        """Создание браузера Playwright с нужными настройками.
+
+        proxy - заранее выбранный прокси (иначе выбирается здесь), user_data_dir -
+        отдельный профиль вместо основного, track=False - не учитывать прокси за
+        аккаунтом (это делает вызывающий код, например при параллельном запуске),
+        pooled - контекст в браузере из пула для короткой операции (закрывать
+        через _close_account_browser, чтобы браузер вернулся в пул).
+        """
+        proxy_config = None
+        launch_proxy = None
+        browser = None
+        try:
+            # User-Agent и размер окна не меняются между запусками аккаунта
+            identity = self.get_account_identity(account)
+            user_agent = identity['user_agent']
             print(f"Используется User-Agent: {user_agent}")
 
             # Настройки для браузера
-            browser_args = [
-                "--start-maximized",
-                "--disable-notifications",
-                "--disable-popup-blocking",
-                "--disable-gpu",
-                "--no-sandbox",
-                "--ignore-certificate-errors",
-                "--ignore-ssl-errors",
-                "--disable-web-security",  # Отключаем проверки безопасности
-                "--disable-features=IsolateOrigins,site-per-process",  # Отключаем изоляцию
-                "--disable-site-isolation-trials",  # Отключаем изоляцию сайтов
-                "--disable-blink-features=AutomationControlled",  # Скрываем автоматизацию
-                "--aggressive-cache-discard",  # Отключаем кэш
-                "--disable-cache",  # Отключаем кэш
-                "--disable-application-cache",  # Отключаем кэш приложений
-                "--disable-infobars",  # Скрываем инфо панели
-                "--window-size=1920,1080",  # Фиксированный размер окна
-                "--lang=ru-RU,ru",  # Устанавливаем русский язык
-                "--disable-extensions",  # Отключаем расширения
-                "--disable-dev-shm-usage",  # Отключаем использование /dev/shm
-                "--disable-accelerated-2d-canvas",  # Отключаем ускорение 2D
-                "--disable-default-apps",  # Отключаем приложения по умолчанию
-                "--no-first-run",  # Отключаем первый запуск
-            ]
+            browser_args = self._get_browser_args()
 
             # Добавление прокси, если указан
-            proxy_config = None
-            if account.get('proxy'):
-                proxy_url = account['proxy']
-                # Playwright использует другой формат настройки прокси
-                proxy_parts = proxy_url.replace('http://', '').split(':')
-                if len(proxy_parts) == 2:
-                    proxy_config = {
-                        "server": proxy_url
-                    }
-                print(f"Используется прокси: {proxy_url}")
+            # Выбор прокси может ждать пул и быструю проверку - выполняем его вне цикла событий
+            # proxy="" - прокси уже выбирали, и подходящего не нашлось: повторно не выбираем
+            launch_proxy = proxy if proxy is not None else await asyncio.to_thread(
+                self._select_browser_proxy, account, headless, register=track)
+            if not launch_proxy and account.get('proxy'):
+                # Аккаунт с заданным прокси не должен выходить в сеть с реального IP
+                print(f"Нет доступного прокси для аккаунта {account['username']}, запуск браузера отменен")
+                return None, None
+            if launch_proxy:
+                # Playwright принимает логин и пароль прокси отдельно от адреса
+                proxy_config = self.proxy_manager.get_playwright_proxy(launch_proxy)
+                if proxy_config is None:
+                    raise ValueError(f"прокси {launch_proxy} нельзя использовать в браузере")
+                print(f"Используется прокси: {proxy_config['server']} "
+                      f"(аккаунтов на прокси: {self.proxy_manager.get_proxy_load(launch_proxy)})")
             elif not headless:
-                # Если прокси не задан и браузер не в скрытом режиме,
-                # попробуем использовать случайный прокси
-                random_proxy = self.proxy_manager.get_random_proxy()
-                if random_proxy:
-                    proxy_config = {
-                        "server": random_proxy
-                    }
-                    print(f"Используется случайный прокси: {random_proxy}")
-
-            # В минимальном режиме не загружаем изображения и другие ресурсы
+                print("Нет доступных прокси, браузер запускается без прокси")
+
             if self.minimal_mode:
                 print("Включен минимальный режим - отключаем загрузку изображений и других ресурсов")
-                browser_args.extend([
-                    "--disable-images",
-                    "--blink-settings=imagesEnabled=false"
-                ])
-
-            # Создаем браузер с нужными параметрами
-            browser = playwright.chromium.launch_persistent_context(
-                user_data_dir=user_data_dir,
-                headless=headless,
-                proxy=proxy_config,
-                user_agent=user_agent,
-                args=browser_args,
-                ignore_https_errors=True,
-                timeout=15000,  # 15 секунд таймаут для запуска
-                viewport={"width": 1280, "height": 720},
-                java_script_enabled=True
-            )
+
+            pool_browser = None
+            if pooled and self.warm_pool_enabled:
+                pool_browser = await self.browser_pool.lease(self.pool_lease_timeout)
+            if pool_browser is not None:
+                # Контекст аккаунта в заранее запущенном браузере пула
+                try:
+                    browser = await self._close_if_cancelled(
+                        self._new_account_context(account, pool_browser, proxy_config, identity))
+                except (Exception, asyncio.CancelledError):
+                    await self.browser_pool.release(pool_browser)
+                    raise
+            elif self.multi_context_mode:
+                # Легкий изолированный контекст аккаунта в общем Chromium
+                shared_browser = await self._get_shared_browser(headless, browser_args)
+                browser = await self._close_if_cancelled(
+                    self._new_account_context(account, shared_browser, proxy_config, identity))
+            else:
+                # Настройка на хранение данных для каждого аккаунта в отдельной папке
+                if user_data_dir is None:
+                    user_data_dir = self._get_user_data_dir(account)
+                os.makedirs(user_data_dir, exist_ok=True)
+
+                # Создаем браузер с нужными параметрами
+                browser = await self._close_if_cancelled(self.engine.playwright.chromium.launch_persistent_context(
+                    user_data_dir=user_data_dir,
+                    headless=headless,
+                    proxy=proxy_config,
+                    user_agent=user_agent,
+                    args=browser_args,
+                    ignore_https_errors=True,
+                    timeout=15000,  # 15 секунд таймаут для запуска
+                    viewport=identity['viewport'],
+                    java_script_enabled=True
+                ))
+                await self._restore_session_cookies(account, browser)
 
             # Создаем новую страницу в браузере
-            page = browser.new_page()
+            page = await browser.new_page()
 
-            # Устанавливаем очень короткие таймауты в минимальном режиме
+            # Устанавливаем очень короткие таймауты в минимальном режиме.
+            # Базовые значения подстраиваются под задержку прокси
             if self.minimal_mode:
-                page.set_default_timeout(500000)  # 5 секунд таймаут для операций
-                page.set_default_navigation_timeout(1000000)  # 10 секунд для навигации
+                page.set_default_timeout(self._get_timeout(launch_proxy, 5000, 2))  # ~5 секунд для операций
+                page.set_default_navigation_timeout(self._get_timeout(launch_proxy, 10000, 4))  # ~10 секунд для навигации
             else:
-                page.set_default_timeout(1500000)  # 15 секунд таймаут для операций
-                page.set_default_navigation_timeout(2000000)  # 20 секунд для навигации
+                page.set_default_timeout(self._get_timeout(launch_proxy, 15000, 2))  # ~15 секунд для операций
+                page.set_default_navigation_timeout(self._get_timeout(launch_proxy, 20000, 4))  # ~20 секунд для навигации
 
             # Установка дополнительных обработчиков JavaScript
-            page.add_init_script("""
+            await page.add_init_script("""
                 // Переопределение объектов для скрытия автоматизации
                 Object.defineProperty(navigator, 'webdriver', {
                     get: () => false,
@@ -204,19 +460,191 @@ class SimpleGameBot:
 
             print(f"Браузер успешно создан для {account['username']}")
 
-            return browser, page, playwright
+            if track:
+                self._track_browser_proxy(account, launch_proxy, headless)
+
+            return browser, page
+        except asyncio.CancelledError:
+            # Отмена (например, опоздавшая попытка хеджированного запуска): браузер и профиль освобождаются
+            if browser is not None:
+                try:
+                    await self._close_account_browser(account['username'], browser, save_session=False)
+                except Exception:
+                    pass
+            if launch_proxy and track:
+                self.proxy_manager.release_proxy(account['username'])
+            raise
         except Exception as e:
             print(f"Критическая ошибка при создании браузера: {e}")
-            # Закрываем Playwright, если он был создан в этой функции
-            if playwright_instance is None and playwright is not None:
+            if browser is not None:
                 try:
-                    playwright.stop()
-                except:
+                    await self._close_account_browser(account['username'], browser, save_session=False)
+                except Exception:
                     pass
-            return None, None, None
+            if launch_proxy:
+                # Закрытый профиль, отсутствие Chromium и т.п. - не повод отправлять прокси в карантин
+                if self._is_network_error(e):
+                    self.proxy_manager.report_proxy_result(launch_proxy, "launch", False)
+                if track:
+                    self.proxy_manager.release_proxy(account['username'])
+            return None, None
 
-    def login_account(self, page, account):
-        """Вход в аккаунт через форму авторизации"""
+    @staticmethod
+    async def _close_if_cancelled(coroutine):
+        """Ожидание запуска браузера или создания контекста, которое не прерывается отменой.
+
+        Если ожидающую задачу отменили, запуск доводится до конца и созданный
+        объект закрывается, чтобы не оставить процесс Chromium и занятый профиль.
+        """
+        task = asyncio.ensure_future(coroutine)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            result = (await asyncio.gather(task, return_exceptions=True))[0]
+            if not isinstance(result, BaseException):
+                try:
+                    await result.close()
+                except Exception:
+                    pass
+            raise
+
+    async def _get_shared_browser(self, headless, browser_args):
+        """Общий Chromium для контекстов аккаунтов (запускается при первом обращении)"""
+        if self._shared_browser_lock is None:
+            self._shared_browser_lock = asyncio.Lock()
+        key = (headless, self.minimal_mode)
+        async with self._shared_browser_lock:
+            browser = self.shared_browsers.get(key)
+            if browser is None or not browser.is_connected():
+                print(f"Запуск общего Chromium ({'скрытый' if headless else 'видимый'} режим)...")
+                # Прокси задается для каждого контекста отдельно
+                browser = await self.engine.playwright.chromium.launch(
+                    headless=headless,
+                    args=browser_args,
+                    timeout=15000  # 15 секунд таймаут для запуска
+                )
+                self.shared_browsers[key] = browser
+        return browser
+
+    async def _new_account_context(self, account, browser, proxy_config, identity):
+        """Изолированный контекст аккаунта в общем Chromium с восстановлением сохраненной сессии"""
+        options = dict(
+            proxy=proxy_config,
+            user_agent=identity['user_agent'],
+            viewport=identity['viewport'],
+            ignore_https_errors=True,
+            java_script_enabled=True
+        )
+        state_path = self._get_storage_state_path(account['username'])
+        if self._has_valid_session(account):
+            try:
+                return await browser.new_context(storage_state=state_path, **options)
+            except Error as e:
+                print(f"Не удалось восстановить сессию {account['username']}, контекст создается заново: {e}")
+        return await browser.new_context(**options)
+
+    async def _restore_session_cookies(self, account, browser):
+        """Перенос cookies из снимка сессии в постоянный профиль, в котором их нет (новый профиль)"""
+        if not self._has_valid_session(account) or await browser.cookies(self.game_url):
+            return
+        try:
+            with open(self._get_storage_state_path(account['username']), 'r', encoding='utf-8') as file:
+                cookies = json.load(file).get('cookies', [])
+            if cookies:
+                await browser.add_cookies(cookies)
+        except Exception as e:
+            print(f"Не удалось восстановить сессию {account['username']}: {e}")
+
+    async def _save_storage_state(self, username, browser):
+        """Сохранение cookies и localStorage контекста аккаунта со сроком действия снимка"""
+        try:
+            state = await browser.storage_state()
+            cookies = state.get('cookies', [])
+            if not cookies:
+                return
+            state_path = self._get_storage_state_path(username)
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+            await asyncio.to_thread(write_json_atomic, state_path, state)
+
+            # Снимок действует session_ttl, но не дольше самой долгоживущей cookie
+            saved = time.time()
+            expires = saved + self.session_ttl
+            cookie_expires = [cookie['expires'] for cookie in cookies if cookie.get('expires', -1) > 0]
+            if cookie_expires:
+                expires = min(expires, max(cookie_expires))
+            with self.accounts_lock:
+                for account in self.accounts:
+                    if account['username'] == username:
+                        account['session'] = {'saved': int(saved), 'expires': int(expires)}
+                        self.save_accounts()
+                        break
+        except Exception as e:
+            print(f"Ошибка при сохранении сессии {username}: {e}")
+
+    async def _close_account_browser(self, username, browser, save_session=True):
+        """Закрытие браузера аккаунта с сохранением снимка сессии"""
+        chromium = browser.browser
+        if save_session:
+            await self._save_storage_state(username, browser)
+        try:
+            await browser.close()
+        finally:
+            # Браузер пула возвращается в пул для следующей операции
+            if self.browser_pool.owns(chromium):
+                await self.browser_pool.release(chromium)
+
+    async def _launch_pool_browser(self):
+        """Запуск скрытого Chromium для пула коротких операций"""
+        return await self.engine.playwright.chromium.launch(
+            headless=True,
+            args=self._get_browser_args(),
+            timeout=15000  # 15 секунд таймаут для запуска
+        )
+
+    def warm_up_browser_pool(self):
+        """Фоновый запуск браузеров пула, чтобы первая короткая операция не ждала холодного старта"""
+        if self.warm_pool_enabled:
+            threading.Thread(target=self._run, args=(self.browser_pool.warm_up(),),
+                             name="browser-pool-warm-up", daemon=True).start()
+
+    async def login_account(self, page, account, proxy_url=None):
+        """Вход в аккаунт: по сохраненной сессии, если ее отклонили - через форму авторизации.
+
+        proxy_url - прокси браузера, по задержке которого выбираются таймауты (по
+        умолчанию - прокси запущенного браузера аккаунта, "" - без прокси).
+        True - вход выполнен, False - вход не выполнен не по вине сети (например,
+        неверный пароль), None - страница не загрузилась (сеть или прокси).
+        """
+        if proxy_url is None:
+            proxy_url = self.browser_proxies.get(account['username'])
+        if self._has_valid_session(account) and await self._resume_session(page, account, proxy_url):
+            login_success = True
+        else:
+            login_success = await self._login_with_form(page, account, proxy_url)
+        if login_success:
+            await self._save_storage_state(account['username'], page.context)
+        return login_success
+
+    async def _resume_session(self, page, account, proxy_url):
+        """Переход сразу к списку серверов с cookies сохраненной сессии"""
+        try:
+            print(f"Вход по сохраненной сессии для аккаунта {account['username']}...")
+            await page.goto(self.game_url, wait_until="commit", timeout=self._get_timeout(proxy_url, 10000, 4))
+            # Ждем первое из двух: список серверов (сессия принята) или форму входа (отклонена)
+            await page.wait_for_selector("#serversView, #loginForm", state="attached",
+                                         timeout=self._get_timeout(proxy_url, 5000, 3))
+            if await page.query_selector("#serversView"):
+                print(f"Аккаунт {account['username']} вошел по сохраненной сессии")
+                return True
+            print(f"Сохраненная сессия {account['username']} отклонена, выполняем вход через форму")
+            self._invalidate_session(account)
+        except Exception as e:
+            print(f"Не удалось войти по сохраненной сессии: {e}")
+        return False
+
+    async def _login_with_form(self, page, account, proxy_url):
+        """Вход в аккаунт через форму авторизации (результат - как у login_account)"""
+        # Таймауты зависят от задержки прокси, через который работает браузер (proxy_url)
         try:
             print(f"Выполняем вход для аккаунта {account['username']}...")
 
@@ -228,7 +656,7 @@ class SimpleGameBot:
                     # Пробуем загрузить страницу без ожидания полной загрузки
                     try:
                         print("Попытка быстрой загрузки...")
-                        page.goto(self.game_url, timeout=5000, wait_until="commit")
+                        await page.goto(self.game_url, timeout=self._get_timeout(proxy_url, 5000, 1.5), wait_until="commit")
                     except TimeoutError:
                         print("Таймаут загрузки, продолжаем работу с тем, что есть")
                         # Если произошел таймаут, продолжаем работу с тем, что уже загружено
@@ -237,7 +665,7 @@ class SimpleGameBot:
                     # Проверяем состояние страницы, используя JavaScript
                     try:
                         # Проверяем, нужна ли авторизация (есть ли форма логина)
-                        form_exists = page.evaluate("""() => {
+                        form_exists = await page.evaluate("""() => {
                             return document.getElementById('loginForm') !== null;
                         }""")
 
@@ -245,7 +673,7 @@ class SimpleGameBot:
                             print("Форма авторизации найдена, выполняем вход...")
 
                             # Вводим логин и пароль с помощью JavaScript напрямую
-                            page.evaluate(f"""(username, password) => {{
+                            await page.evaluate(f"""(username, password) => {{
                                 const usernameField = document.getElementById('username');
                                 const passwordField = document.getElementById('password');
                                 if (usernameField) usernameField.value = username;
@@ -261,11 +689,11 @@ class SimpleGameBot:
                             }}""", account["username"], account["password"])
 
                             # Короткая пауза для обработки входа
-                            time.sleep(2)
+                            await asyncio.sleep(2)
 
                             # Проверяем, удалось ли войти (исчезла ли форма логина)
                             try:
-                                login_success = page.evaluate("""() => {
+                                login_success = await page.evaluate("""() => {
                                     return document.getElementById('loginForm') === null;
                                 }""")
 
@@ -277,11 +705,11 @@ class SimpleGameBot:
                                     return False
                             except:
                                 print("Не удалось проверить результат входа")
-                                return False
+                                return None
 
                         else:
                             # Проверяем, есть ли список серверов
-                            servers_exist = page.evaluate("""() => {
+                            servers_exist = await page.evaluate("""() => {
                                 return document.getElementById('serversView') !== null;
                             }""")
 
@@ -290,91 +718,95 @@ class SimpleGameBot:
                                 return True
                             else:
                                 print("Ни форма логина, ни список серверов не найдены")
-                                return False
+                                return None
                     except Exception as js_error:
                         print(f"Ошибка при выполнении JavaScript: {js_error}")
-                        return False
+                        return None if self._is_network_error(js_error) else False
 
                 except Exception as quick_error:
                     print(f"Ошибка при быстром входе: {quick_error}")
-                    return False
+                    return None if self._is_network_error(quick_error) else False
             else:
                 # Стандартный режим: обычный вход с ожиданиями
                 try:
                     print("Стандартный режим: загрузка с ожиданием")
-                    page.goto(self.game_url, wait_until='domcontentloaded', timeout=10000)
+                    await page.goto(self.game_url, wait_until='domcontentloaded', timeout=self._get_timeout(proxy_url, 10000, 4))
                 except Exception as e:
                     print(f"Ошибка при загрузке главной страницы: {e}")
-                    return False
+                    return None if self._is_network_error(e) else False
 
                 # Проверяем наличие формы логина
                 try:
-                    login_form_exists = page.is_visible("#loginForm", timeout=5000)
+                    login_form_exists = await page.is_visible("#loginForm", timeout=self._get_timeout(proxy_url, 5000, 1))
                     if login_form_exists:
                         print(f"Форма авторизации найдена для аккаунта {account['username']}...")
 
                         # Быстрый ввод логина и пароля
-                        page.fill("#username", account["username"])
-                        page.fill("#password", account["password"])
+                        await page.fill("#username", account["username"])
+                        await page.fill("#password", account["password"])
 
                         # Установка флажка "входить автоматически"
                         try:
-                            remember_me = page.query_selector("#rememberMe")
-                            if remember_me and not remember_me.is_checked():
-                                remember_me.check()
+                            remember_me = await page.query_selector("#rememberMe")
+                            if remember_me and not await remember_me.is_checked():
+                                await remember_me.check()
                         except:
                             pass
 
                         # Быстрое нажатие на кнопку входа
-                        page.click("#loginButton")
+                        await page.click("#loginButton")
 
                         # Ждем появления списка серверов с коротким таймаутом
                         try:
-                            page.wait_for_selector("#serversView", timeout=5000)
+                            await page.wait_for_selector("#serversView", timeout=self._get_timeout(proxy_url, 5000, 3))
                             print(f"Выполнен вход для аккаунта {account['username']}")
                             return True
                         except Exception as e:
                             print(f"Ошибка при ожидании загрузки страницы серверов: {e}")
-                            return False
+                            # Форма входа осталась на странице - данные отклонены, а не сбой сети
+                            try:
+                                if await page.is_visible("#loginForm"):
+                                    return False
+                            except Exception:
+                                pass
+                            return None if self._is_network_error(e) else False
                     else:
                         # Уже авторизован, проверяем, есть ли список серверов
-                        servers_view_exists = page.is_visible("#serversView", timeout=3000)
+                        servers_view_exists = await page.is_visible("#serversView", timeout=self._get_timeout(proxy_url, 3000, 1))
                         if servers_view_exists:
                             print(f"Аккаунт {account['username']} уже авторизован")
                             return True
                         else:
                             # Быстрое обновление страницы
-                            page.reload(wait_until='domcontentloaded', timeout=10000)
+                            await page.reload(wait_until='domcontentloaded', timeout=self._get_timeout(proxy_url, 10000, 4))
 
                             # Проверяем еще раз после обновления
-                            servers_view_exists = page.is_visible("#serversView", timeout=3000)
+                            servers_view_exists = await page.is_visible("#serversView", timeout=self._get_timeout(proxy_url, 3000, 1))
                             if servers_view_exists:
                                 print(f"После обновления страницы обнаружен список серверов")
                                 return True
                             else:
                                 print(f"После обновления страницы не найден список серверов")
-                                return False
+                                return None
                 except Exception as e:
                     print(f"Исключение при авторизации: {e}")
-                    return False
+                    return None if self._is_network_error(e) else False
 
         except Exception as e:
             print(f"Ошибка при входе в аккаунт: {e}")
-            return False
+            return None if self._is_network_error(e) else False
 
     def update_account_servers(self, account_idx):
+        """Обновление списка серверов для аккаунта (вызов из потоков интерфейса)"""
+        return self._run(self.update_account_servers_async(account_idx))
+
+    async def update_account_servers_async(self, account_idx):
         """Обновление списка серверов для аккаунта через вход в игру"""
         if 0 <= account_idx < len(self.accounts):
             account = self.accounts[account_idx]
 
             print(f"Обновление серверов для аккаунта {account['username']}...")
 
-            # Получаем экземпляр Playwright для этого потока
-            playwright = self._get_playwright()
-            if not playwright:
-                print("Не удалось инициализировать Playwright")
-                return False
-
             # Флаг, указывающий, был ли создан временный браузер специально для этой операции
             temp_browser_created = False
 
@@ -385,25 +817,24 @@ class SimpleGameBot:
             if not browser or not page:
                 # Создаем новый браузер в режиме headless для обновления серверов
                 print("Создание временного браузера для обновления серверов...")
-                browser, page, _ = self.create_browser(account, headless=True, playwright_instance=playwright)
+                browser, page = await self.create_browser(account, headless=True, pooled=True)
                 temp_browser_created = True
 
                 if not browser or not page:
                     print("Не удалось создать браузер")
-                    playwright.stop()
                     return False
 
             try:
                 # Авторизуемся
-                login_success = self.login_account(page, account)
+                login_success = await self.login_account(page, account)
+                self._report_login_result(account, login_success)
                 if not login_success:
                     print(f"Не удалось авторизоваться для аккаунта {account['username']}")
                     # Если в аккаунте уже есть серверы, используем их
                     if account.get('servers'):
                         print(f"Используем кэшированный список серверов ({len(account['servers'])} шт)")
                         if temp_browser_created:
-                            browser.close()
-                            playwright.stop()
+                            await self._close_account_browser(account['username'], browser, save_session=False)
                         return True
                     raise Exception("Ошибка авторизации")
 
@@ -415,7 +846,7 @@ class SimpleGameBot:
                     try:
                         print("Минимальный режим: получение серверов через JavaScript")
                         # Используем JavaScript для извлечения данных серверов
-                        server_data = page.evaluate("""() => {
+                        server_data = await page.evaluate("""() => {
                             const servers = [];
                             const blocks = document.querySelectorAll(".jewel.group.layout.vertical.gap-8x1px");
 
@@ -483,11 +914,14 @@ class SimpleGameBot:
                     print("Стандартный режим: получение серверов через селекторы")
                     try:
                         # Проверяем, видим ли мы список серверов
-                        servers_view_visible = page.is_visible("#serversView", timeout=5000)
+                        proxy_url = self.browser_proxies.get(account['username'])
+                        servers_view_visible = await page.is_visible("#serversView",
+                                                               timeout=self._get_timeout(proxy_url, 5000, 1))
                         if not servers_view_visible:
                             print("Список серверов не виден, пробуем обновить страницу")
-                            page.reload(wait_until='domcontentloaded', timeout=10000)
-                            servers_view_visible = page.is_visible("#serversView", timeout=5000)
+                            await page.reload(wait_until='domcontentloaded', timeout=self._get_timeout(proxy_url, 10000, 4))
+                            servers_view_visible = await page.is_visible("#serversView",
+                                                                   timeout=self._get_timeout(proxy_url, 5000, 1))
 
                             if not servers_view_visible:
                                 print("Список серверов не найден после обновления")
@@ -495,13 +929,13 @@ class SimpleGameBot:
                                 if account.get('servers'):
                                     print(f"Используем кэшированный список серверов ({len(account['servers'])} шт)")
                                     if temp_browser_created:
-                                        browser.close()
-                                        playwright.stop()
+                                        await self._close_account_browser(account['username'], browser,
+                                                                          save_session=False)
                                     return True
                                 raise Exception("Список серверов не найден")
 
                         # Получаем все блоки серверов
-                        server_blocks = page.query_selector_all(".jewel.group.layout.vertical.gap-8x1px")
+                        server_blocks = await page.query_selector_all(".jewel.group.layout.vertical.gap-8x1px")
                         print(f"Найдено блоков серверов: {len(server_blocks)}")
 
                         server_names = set()  # Для отслеживания дублирующихся имен серверов
@@ -509,11 +943,11 @@ class SimpleGameBot:
                         for block in server_blocks:
                             try:
                                 # Проверяем, что это блок сервера (содержит имя сервера)
-                                name_element = block.query_selector("#displayName")
-                                if not name_element or not name_element.inner_text():
+                                name_element = await block.query_selector("#displayName")
+                                if not name_element or not await name_element.inner_text():
                                     continue  # Пропускаем пустые блоки
 
-                                server_name = name_element.inner_text()
+                                server_name = await name_element.inner_text()
 
                                 # Пропускаем серверы с дублирующимися именами
                                 if server_name in server_names:
@@ -524,9 +958,9 @@ class SimpleGameBot:
 
                                 # Определяем, посещал ли пользователь сервер ранее
                                 try:
-                                    enter_button = block.query_selector("#enterButton")
-                                    button_style = enter_button.get_attribute("style") or ""
-                                    button_class = enter_button.get_attribute("class") or ""
+                                    enter_button = await block.query_selector("#enterButton")
+                                    button_style = await enter_button.get_attribute("style") or ""
+                                    button_class = await enter_button.get_attribute("class") or ""
 
                                     visited = "-1350px -184px" in button_style
                                     disabled = "disabled" in button_class
@@ -537,9 +971,9 @@ class SimpleGameBot:
                                 # Получаем статус сервера (если есть)
                                 server_state = ""
                                 try:
-                                    state_element = block.query_selector("#serverState")
+                                    state_element = await block.query_selector("#serverState")
                                     if state_element:
-                                        server_state = state_element.inner_text()
+                                        server_state = await state_element.inner_text()
                                 except:
                                     pass
 
@@ -549,23 +983,23 @@ class SimpleGameBot:
                                 total_count = 0
 
                                 try:
-                                    online_label = block.query_selector("#onlineLabel")
-                                    if online_label and online_label.inner_text().isdigit():
-                                        online_count = int(online_label.inner_text())
+                                    online_label = await block.query_selector("#onlineLabel")
+                                    if online_label and (await online_label.inner_text()).isdigit():
+                                        online_count = int(await online_label.inner_text())
                                 except:
                                     pass
 
                                 try:
-                                    active_label = block.query_selector("#activeLabel")
-                                    if active_label and active_label.inner_text().isdigit():
-                                        active_count = int(active_label.inner_text())
+                                    active_label = await block.query_selector("#activeLabel")
+                                    if active_label and (await active_label.inner_text()).isdigit():
+                                        active_count = int(await active_label.inner_text())
                                 except:
                                     pass
 
                                 try:
-                                    total_label = block.query_selector("#totalLabel")
-                                    if total_label and total_label.inner_text().isdigit():
-                                        total_count = int(total_label.inner_text())
+                                    total_label = await block.query_selector("#totalLabel")
+                                    if total_label and (await total_label.inner_text()).isdigit():
+                                        total_count = int(await total_label.inner_text())
                                 except:
                                     pass
 
@@ -588,14 +1022,14 @@ class SimpleGameBot:
                 if not servers and account.get('servers'):
                     print(f"Список серверов пуст, используем кэшированные данные ({len(account['servers'])} шт)")
                     if temp_browser_created:
-                        browser.close()
-                        playwright.stop()
+                        await self._close_account_browser(account['username'], browser)
                     return True
 
                 # Обновляем информацию о серверах в аккаунте, если получили хотя бы один сервер
                 if servers:
-                    account['servers'] = servers
-                    self.save_accounts()
+                    with self.accounts_lock:
+                        account['servers'] = servers
+                        self.save_accounts()
                     print(f"Обновлено {len(servers)} серверов для аккаунта {account['username']}")
                 else:
                     print("Не найдено ни одного сервера!")
@@ -603,13 +1037,11 @@ class SimpleGameBot:
                 # Если мы создали временный браузер, закрываем его
                 if temp_browser_created:
                     print(f"Закрытие временного браузера после обновления серверов для {account['username']}...")
-                    browser.close()
-                    playwright.stop()
+                    await self._close_account_browser(account['username'], browser)
                 else:
                     # Иначе сохраняем браузер и страницу для повторного использования
                     self.browsers[account['username']] = browser
                     self.pages[account['username']] = page
-                    # В этом случае НЕ закрываем playwright, так как он используется другими браузерами
 
                 print(f"Обновление серверов для аккаунта {account['username']} завершено успешно")
                 return True
@@ -621,8 +1053,7 @@ class SimpleGameBot:
                 if temp_browser_created:
                     try:
                         if browser:
-                            browser.close()
-                        playwright.stop()
+                            await self._close_account_browser(account['username'], browser, save_session=False)
                         print(f"Закрыт временный браузер после ошибки для {account['username']}")
                     except Exception as close_error:
                         print(f"Ошибка при закрытии временного браузера: {close_error}")
@@ -637,8 +1068,14 @@ class SimpleGameBot:
             print("Неверный номер аккаунта")
             return False
 
-    def enter_server(self, page, server_name):
-        """Вход на указанный сервер"""
+    async def enter_server(self, page, server_name, account=None):
+        """Вход на указанный сервер.
+
+        True - вход выполнен, False - сервер недоступен или не найден, None - страница
+        не загрузилась (сеть или прокси).
+        """
+        # Таймауты зависят от задержки прокси, через который работает браузер аккаунта
+        proxy_url = self.browser_proxies.get(account['username']) if account else None
         try:
             print(f"Вход на сервер {server_name}...")
 
@@ -647,7 +1084,7 @@ class SimpleGameBot:
                 # Минимальный режим: используем JavaScript напрямую
                 try:
                     # Проверяем, что мы на странице со списком серверов
-                    servers_view_exists = page.evaluate("""() => {
+                    servers_view_exists = await page.evaluate("""() => {
                         return document.getElementById('serversView') !== null;
                     }""")
 
@@ -655,23 +1092,25 @@ class SimpleGameBot:
                         print("Список серверов не найден, пробуем перейти на главную страницу")
 
                         # Пробуем загрузить страницу без ожидания полной загрузки
+                        load_timed_out = False
                         try:
-                            page.goto(self.game_url, timeout=5000, wait_until="commit")
+                            await page.goto(self.game_url, timeout=self._get_timeout(proxy_url, 5000, 1.5), wait_until="commit")
                         except TimeoutError:
                             print("Таймаут загрузки, продолжаем работу с тем, что есть")
-                            pass
+                            load_timed_out = True
 
                         # Проверяем еще раз
-                        servers_view_exists = page.evaluate("""() => {
+                        servers_view_exists = await page.evaluate("""() => {
                             return document.getElementById('serversView') !== null;
                         }""")
 
                         if not servers_view_exists:
                             print("Список серверов не найден после перехода на главную")
-                            return False
+                            # Страница не загрузилась за отведенное время - вероятно, по вине сети или прокси
+                            return None if load_timed_out else False
 
                     # Используем JavaScript для поиска и клика по кнопке входа
-                    server_entered = page.evaluate("""(serverName) => {
+                    server_entered = await page.evaluate("""(serverName) => {
                         // Ищем все элементы с названиями серверов
                         const nameElements = document.querySelectorAll('#displayName');
 
@@ -709,7 +1148,7 @@ class SimpleGameBot:
                     if server_entered:
                         print(f"Выполнен вход на сервер {server_name}")
                         # Короткая пауза для инициации загрузки игры
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                         return True
                     else:
                         print(f"Не удалось войти на сервер {server_name}")
@@ -717,28 +1156,28 @@ class SimpleGameBot:
 
                 except Exception as js_error:
                     print(f"Ошибка при входе на сервер через JavaScript: {js_error}")
-                    return False
+                    return None if self._is_network_error(js_error) else False
 
             else:
                 # Стандартный режим: используем селекторы
                 # Проверяем, что мы на странице со списком серверов, без длительного ожидания
-                if not page.is_visible("#serversView", timeout=3000):
+                if not await page.is_visible("#serversView", timeout=self._get_timeout(proxy_url, 3000, 1)):
                     print("Переход на страницу со списком серверов...")
-                    page.goto(self.game_url, wait_until='domcontentloaded', timeout=10000)
-                    if not page.is_visible("#serversView", timeout=3000):
+                    await page.goto(self.game_url, wait_until='domcontentloaded', timeout=self._get_timeout(proxy_url, 10000, 4))
+                    if not await page.is_visible("#serversView", timeout=self._get_timeout(proxy_url, 3000, 1)):
                         print("Не удалось найти список серверов")
                         return False
 
                 # Ищем все элементы с названиями серверов
                 found = False
-                server_name_elements = page.query_selector_all("#displayName")
+                server_name_elements = await page.query_selector_all("#displayName")
 
                 for element in server_name_elements:
-                    if element.inner_text() == server_name:
+                    if await element.inner_text() == server_name:
                         # Нашли нужный сервер, ищем блок сервера (поднимаемся на 4 уровня вверх)
                         parent_block = element
                         for _ in range(4):
-                            parent_block = parent_block.evaluate("el => el.parentElement")
+                            parent_block = await parent_block.evaluate("el => el.parentElement")
                             if not parent_block:
                                 break
 
@@ -747,7 +1186,7 @@ class SimpleGameBot:
                             continue
 
                         # Находим кнопку входа в блоке
-                        enter_button = page.evaluate("""(parentBlock, serverName) => {
+                        enter_button = await page.evaluate("""(parentBlock, serverName) => {
                             const button = parentBlock.querySelector("#enterButton");
                             if (!button) return null;
 
@@ -764,11 +1203,11 @@ class SimpleGameBot:
                             return False
 
                         # Кликаем на кнопку входа
-                        page.evaluate("button => button.click()", enter_button)
+                        await page.evaluate("button => button.click()", enter_button)
                         print(f"Выполнен вход на сервер {server_name}")
 
                         # Короткое ожидание вместо долгого
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                         found = True
                         return True
 
@@ -778,9 +1217,37 @@ class SimpleGameBot:
 
         except Exception as e:
             print(f"Ошибка при входе на сервер: {e}")
-            return False
+            return None if self._is_network_error(e) else False
 
     def launch_account(self, account):
+        """Запуск аккаунта (вызов из потоков интерфейса)"""
+        return self._run(self.launch_account_async(account))
+
+    def launch_accounts(self, accounts, on_start=None):
+        """Одновременный запуск нескольких аккаунтов (вызов из потоков интерфейса), список результатов"""
+        results = self._run(self.launch_accounts_async(accounts, on_start))
+        return results if results is not False else [False] * len(accounts)
+
+    async def launch_accounts_async(self, accounts, on_start=None):
+        """Запуск аккаунтов в цикле движка, не больше max_concurrent_launches одновременно.
+
+        on_start(account) вызывается перед запуском каждого аккаунта (в потоке движка).
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_launches)
+
+        async def launch(account):
+            async with semaphore:
+                if on_start:
+                    on_start(account)
+                return await self.launch_account_async(account)
+
+        results = await asyncio.gather(*(launch(account) for account in accounts), return_exceptions=True)
+        for account, result in zip(accounts, results):
+            if isinstance(result, Exception):
+                print(f"Ошибка при запуске аккаунта {account['username']}: {result}")
+        return [result is True for result in results]
+
+    async def launch_account_async(self, account):
         """Запуск аккаунта и вход на последний выбранный сервер"""
         if not account.get('last_server'):
             print(f"Для аккаунта {account['username']} не выбран сервер")
@@ -788,40 +1255,42 @@ class SimpleGameBot:
 
         print(f"Запуск аккаунта {account['username']} на сервере {account['last_server']}...")
 
-        # Получаем экземпляр Playwright для этого потока
-        playwright = self._get_playwright()
-        if not playwright:
-            print("Не удалось инициализировать Playwright")
-            return False
+        if self.hedged_launch and account['username'] not in self.browsers:
+            return await self._launch_account_hedged(account)
 
         # Проверяем, есть ли уже запущенный браузер
         browser = self.browsers.get(account['username'])
         page = self.pages.get(account['username'])
 
-        if not browser or not page:
+        started = time.monotonic()
+        browser_created = not browser or not page
+        if browser_created:
             # Создаем новый браузер
-            browser, page, _ = self.create_browser(account, playwright_instance=playwright)
+            browser, page = await self.create_browser(account)
             if not browser or not page:
                 print("Не удалось создать браузер для запуска аккаунта")
-                playwright.stop()
                 return False
 
         try:
             # Логинимся, если необходимо
-            login_result = self.login_account(page, account)
+            login_result = await self.login_account(page, account)
+            self._report_login_result(account, login_result)
             if not login_result:
                 print(f"Не удалось войти в аккаунт {account['username']}")
-                playwright.stop()
+                if browser_created:
+                    await self._discard_browser(account['username'], browser)
                 return False
+            if browser_created:
+                self.launch_times.append(time.monotonic() - started)
 
             # Входим на выбранный сервер
-            server_result = self.enter_server(page, account['last_server'])
+            server_result = await self.enter_server(page, account['last_server'], account)
+            self._report_server_result(account, server_result)
             if not server_result:
                 print(f"Не удалось войти на сервер {account['last_server']}")
                 # Сохраняем браузер для повторного использования
                 self.browsers[account['username']] = browser
                 self.pages[account['username']] = page
-                # НЕ закрываем playwright, так как он используется браузером
                 return False
 
             # Сохраняем браузер для повторного использования
@@ -829,7 +1298,6 @@ class SimpleGameBot:
             self.pages[account['username']] = page
 
             print(f"Аккаунт {account['username']} успешно запущен на сервере {account['last_server']}")
-            # НЕ закрываем playwright, так как он используется браузером
             return True
 
         except Exception as e:
@@ -837,10 +1305,150 @@ class SimpleGameBot:
             # Если произошла ошибка, сохраняем браузер для повторного использования
             self.browsers[account['username']] = browser
             self.pages[account['username']] = page
-            # НЕ закрываем playwright, так как он используется браузером
             return False
 
+    async def _discard_browser(self, username, browser):
+        """Закрытие браузера, который не будет использоваться, со снятием учета его прокси"""
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"Ошибка при закрытии браузера: {e}")
+        if self.browsers.get(username) is browser:
+            del self.browsers[username]
+            self.pages.pop(username, None)
+        if username not in self.browsers:
+            self.browser_proxies.pop(username, None)
+            self.proxy_manager.release_proxy(username)
+
+    def _hedge_delay(self):
+        """Задержка перед запасной попыткой запуска: перцентиль времени прошлых входов"""
+        if len(self.launch_times) < 5:
+            return self.hedge_default_delay
+        times = sorted(self.launch_times)
+        index = min(len(times) - 1, int(len(times) * self.hedge_percentile))
+        return max(self.hedge_min_delay, times[index])
+
+    async def _launch_account_hedged(self, account):
+        """Запуск аккаунта с запасной попыткой через другой прокси.
+
+        Если основная попытка не выполнила вход за время _hedge_delay, параллельно
+        запускается вторая с отдельным профилем и другим прокси. Работать остается
+        та, что первой дошла до списка серверов; другая отменяется и закрывает браузер.
+        """
+        # Профиль аккаунта создается в цикле движка, а не в потоке выбора прокси
+        self.get_account_identity(account)
+        # Место на прокси каждой попытки занимается сразу с проверкой лимита: основная - под логином
+        # аккаунта, запасная - под отдельным ключом, который после победы передается аккаунту
+        username = account['username']
+        hedge_key = f"{username}#hedge"
+        primary_proxy = await asyncio.to_thread(self._select_browser_proxy, account, reserve_as=username)
+        attempts = {asyncio.create_task(self._launch_attempt(account, "основная", primary_proxy or "", None))}
+
+        delay = self._hedge_delay()
+        hedge_started = False
+        winner = None
+        try:
+            while attempts and winner is None:
+                done, attempts = await asyncio.wait(attempts, timeout=None if hedge_started else delay,
+                                                    return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    result = attempt.result()
+                    if result is None:
+                        continue
+                    if winner is None:
+                        winner = result
+                    else:
+                        # Обе попытки завершились одновременно - лишний браузер закрываем
+                        await result[0].close()
+                if winner is None and not hedge_started:
+                    hedge_started = True
+                    hedge_proxy = await asyncio.to_thread(
+                        self._select_browser_proxy, account,
+                        exclude=[primary_proxy] if primary_proxy else [], reserve_as=hedge_key)
+                    if hedge_proxy and hedge_proxy != primary_proxy:
+                        print(f"Вход для {account['username']} не выполнен за {delay:.1f} с, "
+                              f"запускаем запасную попытку через {hedge_proxy}")
+                        attempts.add(asyncio.create_task(self._launch_attempt(
+                            account, "запасная", hedge_proxy, self._get_user_data_dir(account, "_hedge"))))
+        finally:
+            # Опоздавшая попытка отменяется и закрывает свой браузер
+            for attempt in attempts:
+                attempt.cancel()
+            if attempts:
+                await asyncio.gather(*attempts, return_exceptions=True)
+            if winner is not None and winner[3] == "запасная":
+                self.proxy_manager.transfer_proxy(hedge_key, username)
+            else:
+                self.proxy_manager.release_proxy(hedge_key)
+                if winner is None:
+                    self.proxy_manager.release_proxy(username)
+
+        if winner is None:
+            print(f"Не удалось войти в аккаунт {account['username']}")
+            return False
+
+        browser, page, proxy_url, name = winner
+        self._track_browser_proxy(account, proxy_url)
+        # Сохраняем браузер для повторного использования
+        self.browsers[account['username']] = browser
+        self.pages[account['username']] = page
+
+        # Входим на выбранный сервер
+        result = await self.enter_server(page, account['last_server'], account)
+        self._report_server_result(account, result)
+        if result:
+            print(f"Аккаунт {account['username']} успешно запущен на сервере {account['last_server']} "
+                  f"(попытка: {name})")
+        else:
+            print(f"Не удалось войти на сервер {account['last_server']}")
+        return bool(result)
+
+    async def _launch_attempt(self, account, name, proxy_url, user_data_dir):
+        """Одна из параллельных попыток запуска: браузер и вход в аккаунт.
+
+        Возвращает (браузер, страница, прокси, название попытки) или None; при
+        неудаче или отмене браузер попытки закрывается.
+        """
+        browser = None
+        try:
+            started = time.monotonic()
+            browser, page = await self.create_browser(account, proxy=proxy_url, user_data_dir=user_data_dir,
+                                                      track=False)
+            if not browser or not page:
+                return None
+
+            # Таймауты входа - по прокси этой попытки, а не по прокси прежнего браузера аккаунта
+            login_result = await self.login_account(page, account, proxy_url or "")
+            self._report_login_result(account, login_result, proxy_url)
+            if not login_result:
+                print(f"Попытка запуска ({name}): не удалось войти в аккаунт {account['username']}")
+                await browser.close()
+                return None
+
+            self.launch_times.append(time.monotonic() - started)
+            return browser, page, proxy_url, name
+        except asyncio.CancelledError:
+            print(f"Попытка запуска ({name}) для {account['username']} опоздала, браузер закрывается")
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+            raise
+        except Exception as e:
+            print(f"Ошибка при запуске аккаунта ({name}): {e}")
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+            return None
+
     def close_browser(self, account_idx):
+        """Закрытие браузера аккаунта (вызов из потоков интерфейса)"""
+        return self._run(self.close_browser_async(account_idx))
+
+    async def close_browser_async(self, account_idx):
         """Закрытие браузера для указанного аккаунта"""
         if 0 <= account_idx < len(self.accounts):
             account = self.accounts[account_idx]
@@ -848,10 +1456,12 @@ class SimpleGameBot:
             if account['username'] in self.browsers:
                 try:
                     print(f"Закрытие браузера для аккаунта {account['username']}...")
-                    self.browsers[account['username']].close()
+                    await self._close_account_browser(account['username'], self.browsers[account['username']])
                     del self.browsers[account['username']]
                     if account['username'] in self.pages:
                         del self.pages[account['username']]
+                    self.browser_proxies.pop(account['username'], None)
+                    self.proxy_manager.release_proxy(account['username'])
                     print(f"Браузер для аккаунта {account['username']} закрыт")
                     return True
                 except Exception as e:
@@ -861,6 +1471,8 @@ class SimpleGameBot:
                         del self.browsers[account['username']]
                     if account['username'] in self.pages:
                         del self.pages[account['username']]
+                    self.browser_proxies.pop(account['username'], None)
+                    self.proxy_manager.release_proxy(account['username'])
                     return False
             else:
                 print(f"Для аккаунта {account['username']} нет запущенного браузера")
@@ -870,8 +1482,12 @@ class SimpleGameBot:
             return False
 
     def close_all_browsers(self):
+        """Закрытие всех браузеров (вызов из потоков интерфейса)"""
+        return self._run(self.close_all_browsers_async())
+
+    async def close_all_browsers_async(self):
         """Закрытие всех браузеров"""
-        if not self.browsers:
+        if not self.browsers and not self.shared_browsers:
             print("Нет запущенных браузеров")
             return True
 
@@ -881,10 +1497,12 @@ class SimpleGameBot:
         for username, browser in list(self.browsers.items()):
             try:
                 print(f"Закрытие браузера для аккаунта {username}...")
-                browser.close()
+                await self._close_account_browser(username, browser)
                 del self.browsers[username]
                 if username in self.pages:
                     del self.pages[username]
+                self.browser_proxies.pop(username, None)
+                self.proxy_manager.release_proxy(username)
                 closed += 1
             except Exception as e:
                 print(f"Ошибка при закрытии браузера для {username}: {e}")
@@ -893,12 +1511,19 @@ class SimpleGameBot:
                     del self.browsers[username]
                 if username in self.pages:
                     del self.pages[username]
+                self.browser_proxies.pop(username, None)
+                self.proxy_manager.release_proxy(username)
                 errors += 1
 
         print(f"Закрыто браузеров: {closed}, с ошибками: {errors}")
 
-        # В этой реализации экземпляры Playwright не хранятся глобально,
-        # поэтому здесь не нужно их освобождать
+        # Общие Chromium режима нескольких контекстов
+        for key, shared_browser in list(self.shared_browsers.items()):
+            try:
+                await shared_browser.close()
+            except Exception as e:
+                print(f"Ошибка при закрытии общего Chromium: {e}")
+            del self.shared_browsers[key]
 
         return True
 
@@ -916,12 +1541,18 @@ class SimpleGameBot:
         return self.proxy_manager.verify_proxies()
 
     def assign_random_proxy_to_account(self, account_idx):
-        """Назначение случайного прокси аккаунту"""
+        """Назначение аккаунту наименее загруженного рабочего прокси"""
         if 0 <= account_idx < len(self.accounts):
-            proxy = self.get_random_proxy()
+            with self.accounts_lock:
+                # Учитываются и прокси, назначенные другим аккаунтам, которые сейчас не запущены
+                assigned = self._get_pool_assignments(skip=[self.accounts[account_idx]['username']])
+                proxy = self.proxy_manager.get_least_loaded_proxy(assigned=assigned)
+                if proxy:
+                    self.accounts[account_idx]['proxy'] = proxy
+                    # Прокси из пула можно переназначать автоматически, в отличие от заданного вручную
+                    self.accounts[account_idx]['proxy_assigned'] = "pool"
+                    self.save_accounts()
             if proxy:
-                self.accounts[account_idx]['proxy'] = proxy
-                self.save_accounts()
                 print(f"Аккаунту {self.accounts[account_idx]['username']} назначен прокси: {proxy}")
                 return True
             else:
@@ -933,6 +1564,10 @@ class SimpleGameBot:
         """Добавление прокси вручную"""
         return self.proxy_manager.add_manual_proxy(proxy_url)
 
+    def import_proxies(self, file_path):
+        """Массовый импорт прокси из файла"""
+        return self.proxy_manager.import_proxies(file_path)
+
     def get_proxy_stats(self):
         """Получение статистики по прокси"""
         return self.proxy_manager.get_proxy_stats()
@@ -1340,6 +1975,9 @@ class GameBotQt(QMainWindow):
         # Загрузка аккаунтов
         self.load_accounts()
 
+        # Заранее запускаем браузеры для обновления серверов
+        self.bot.warm_up_browser_pool()
+
         # Настройка обработчика закрытия окна
         self.closeEvent = self.on_close_event
 
@@ -1428,6 +2066,20 @@ class GameBotQt(QMainWindow):
         self.minimal_mode_checkbox.setStyleSheet("color: white;")
 
         settings_layout.addWidget(self.minimal_mode_checkbox)
+
+        self.hedged_launch_checkbox = QCheckBox("Запасной запуск через второй прокси")
+        self.hedged_launch_checkbox.setChecked(self.bot.hedged_launch)
+        self.hedged_launch_checkbox.stateChanged.connect(self.toggle_hedged_launch)
+        self.hedged_launch_checkbox.setStyleSheet("color: white;")
+
+        settings_layout.addWidget(self.hedged_launch_checkbox)
+
+        self.multi_context_checkbox = QCheckBox("Общий Chromium для аккаунтов (экономия памяти)")
+        self.multi_context_checkbox.setChecked(self.bot.multi_context_mode)
+        self.multi_context_checkbox.stateChanged.connect(self.toggle_multi_context_mode)
+        self.multi_context_checkbox.setStyleSheet("color: white;")
+
+        settings_layout.addWidget(self.multi_context_checkbox)
         right_layout.insertWidget(0, settings_frame)
 
     def toggle_minimal_mode(self, state):
@@ -1435,6 +2087,16 @@ class GameBotQt(QMainWindow):
         self.bot.minimal_mode = bool(state)
         print(f"Минимальный режим {'включен' if self.bot.minimal_mode else 'выключен'}")
 
+    def toggle_hedged_launch(self, state):
+        """Переключение запасного запуска аккаунтов"""
+        self.bot.hedged_launch = bool(state)
+        print(f"Запасной запуск {'включен' if self.bot.hedged_launch else 'выключен'}")
+
+    def toggle_multi_context_mode(self, state):
+        """Переключение режима нескольких контекстов (действует на новые запуски)"""
+        self.bot.multi_context_mode = bool(state)
+        print(f"Общий Chromium для аккаунтов {'включен' if self.bot.multi_context_mode else 'выключен'}")
+
     def create_accounts_panel(self, parent):
         """Создание панели аккаунтов"""
         # Фрейм для панели аккаунтов
@@ -1646,9 +2308,14 @@ class GameBotQt(QMainWindow):
         update_proxies_btn = StyledButton("Обновить прокси")
         update_proxies_btn.clicked.connect(self.update_proxies)
 
+        # Кнопка для импорта своих прокси из файла
+        import_proxies_btn = StyledButton("Импорт прокси")
+        import_proxies_btn.clicked.connect(self.import_proxies)
+
         buttons_layout2.addWidget(close_btn)
         buttons_layout2.addWidget(close_all_btn)
         buttons_layout2.addWidget(update_proxies_btn)
+        buttons_layout2.addWidget(import_proxies_btn)
 
         control_layout.addLayout(buttons_layout2)
 
@@ -1886,8 +2553,9 @@ class GameBotQt(QMainWindow):
                 account["proxy"] = proxy
 
             # Добавление аккаунта
-            self.bot.accounts.append(account)
-            self.bot.save_accounts()
+            with self.bot.accounts_lock:
+                self.bot.accounts.append(account)
+                self.bot.save_accounts()
 
             # Обновление списка
             idx = len(self.bot.accounts) - 1
@@ -1930,8 +2598,9 @@ class GameBotQt(QMainWindow):
                 del self.account_rows[self.selected_account_idx]
 
             # Удаляем аккаунт из модели
-            del self.bot.accounts[self.selected_account_idx]
-            self.bot.save_accounts()
+            with self.bot.accounts_lock:
+                del self.bot.accounts[self.selected_account_idx]
+                self.bot.save_accounts()
 
             # Обновляем индексы оставшихся строк
             new_account_rows = {}
@@ -2041,8 +2710,9 @@ class GameBotQt(QMainWindow):
         old_server_name = account.get('last_server')
 
         # Устанавливаем новый выбранный сервер
-        account['last_server'] = server['name']
-        self.bot.save_accounts()
+        with self.bot.accounts_lock:
+            account['last_server'] = server['name']
+            self.bot.save_accounts()
 
         # Обновляем отображение серверов
         for idx, row in self.server_rows.items():
@@ -2132,26 +2802,27 @@ class GameBotQt(QMainWindow):
         launched = 0
         errors = 0
         updated_accounts = []
+        accounts = []
 
         for i, account in enumerate(self.bot.accounts):
             if account.get("last_server"):
-                self.launch_all_worker.signals.progress.emit(f"Запуск аккаунта {account['username']}...")
-                print(f"Запуск аккаунта {account['username']}...")
-
-                result = self.bot.launch_account(account)
-                if result:
-                    launched += 1
-                else:
-                    errors += 1
-
                 # Добавляем индекс аккаунта для обновления в интерфейсе
                 updated_accounts.append(i)
-
-                # Небольшая пауза между запусками
-                time.sleep(1)
+                accounts.append(account)
             else:
                 print(f"Для аккаунта {account['username']} не выбран сервер. Пропускаю.")
 
+        def on_start(account):
+            self.launch_all_worker.signals.progress.emit(f"Запуск аккаунта {account['username']}...")
+            print(f"Запуск аккаунта {account['username']}...")
+
+        # Аккаунты запускаются одновременно в общем цикле Playwright
+        for result in self.bot.launch_accounts(accounts, on_start):
+            if result:
+                launched += 1
+            else:
+                errors += 1
+
         print(f"Итоги запуска: успешно - {launched}, с ошибками - {errors}")
         return launched, errors, updated_accounts
 
@@ -2296,6 +2967,53 @@ class GameBotQt(QMainWindow):
         self.update_proxies_worker.signals.finished.connect(self.hide_loading)
         self.update_proxies_worker.start()
 
+    def import_proxies(self):
+        """Импорт прокси из файла"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Импорт прокси", "",
+                                                   "Списки прокси (*.txt);;Все файлы (*)")
+        if not file_path:
+            return
+
+        # Показываем индикатор загрузки
+        self.show_loading("Импорт и проверка прокси...")
+
+        # Создаем и запускаем рабочий поток
+        def import_proxies_thread():
+            stats = self.bot.import_proxies(file_path)
+            proxy_stats = self.bot.get_proxy_stats()
+            print(f"Статистика прокси: всего - {proxy_stats['total']}, рабочих - {proxy_stats['working']}")
+            return stats
+
+        self.import_proxies_worker = Worker(import_proxies_thread)
+        self.import_proxies_worker.signals.result.connect(self._on_proxies_imported)
+        self.import_proxies_worker.signals.error.connect(self._on_import_proxies_error)
+        self.import_proxies_worker.start()
+
+    def _on_proxies_imported(self, stats):
+        """Обработчик завершения импорта прокси"""
+        # Скрываем индикатор загрузки
+        self.hide_loading()
+
+        summary = (f"Строк: {stats['lines']}\n"
+                   f"Рабочих: {stats['working']}\n"
+                   f"Нерабочих: {stats['failed']}\n"
+                   f"С ошибкой формата: {stats['invalid']}\n"
+                   f"SOCKS5 с паролем (не поддерживаются): {stats['unsupported']}\n"
+                   f"Повторов: {stats['duplicates']}")
+        if stats.get('error'):
+            QMessageBox.warning(self, "Импорт прокси",
+                                f"Файл прочитан не полностью: {stats['error']}\n\n{summary}")
+        else:
+            QMessageBox.information(self, "Импорт прокси", summary)
+
+    def _on_import_proxies_error(self, error_msg):
+        """Обработчик ошибки при импорте прокси"""
+        # Скрываем индикатор загрузки
+        self.hide_loading()
+
+        # Выводим сообщение об ошибке
+        QMessageBox.warning(self, "Ошибка", f"Ошибка при импорте прокси: {error_msg}")
+
     def assign_proxy(self):
         """Назначение прокси выбранному аккаунту"""
         if self.selected_account_idx is None:
@@ -2349,8 +3067,8 @@ class GameBotQt(QMainWindow):
             self.show_loading("Закрытие всех браузеров...")
 
             def close_all_and_exit():
-                # Закрываем все браузеры
-                self.bot.close_all_browsers()
+                # Закрываем все браузеры и останавливаем драйвер Playwright
+                self.bot.shutdown()
 
                 # Восстанавливаем стандартный вывод
                 sys.stdout = sys.__stdout__
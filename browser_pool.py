@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import deque
+
+
+class WarmBrowserPool:
+    """Пул заранее запущенных скрытых Chromium для коротких операций.
+
+    Обновление серверов и другие короткие задачи берут браузер из пула, создают
+    в нем контекст аккаунта (прокси, User-Agent и сессия задаются при создании
+    контекста) и возвращают браузер обратно. Создание контекста в запущенном
+    Chromium занимает миллисекунды вместо секунд холодного запуска.
+
+    Все методы - корутины цикла событий движка Playwright. Браузер выдается одной
+    операции за раз; лишние простаивающие браузеры (сверх min_size) закрываются
+    через idle_timeout секунд.
+    """
+
+    def __init__(self, launch, max_size=3, min_size=1, idle_timeout=300):
+        self._launch = launch  # Корутина-фабрика запуска браузера
+        self.max_size = max_size
+        self.min_size = min_size
+        self.idle_timeout = idle_timeout
+        self._idle = deque()  # (браузер, время возврата), последние возвращенные - справа
+        self._leased = set()
+        self._launching = 0
+        self._condition = None  # Создается в цикле событий движка
+        self._evictor = None
+
+    def _get_condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _size(self):
+        return len(self._idle) + len(self._leased) + self._launching
+
+    def owns(self, browser):
+        """Выдан ли браузер из пула"""
+        return browser is not None and browser in self._leased
+
+    async def _launch_browser(self):
+        """Запуск нового браузера пула (место в пуле уже занято через _launching)"""
+        try:
+            return await self._launch()
+        finally:
+            self._launching -= 1
+
+    def _start_evictor(self):
+        if self._evictor is None or self._evictor.done():
+            self._evictor = asyncio.create_task(self._evict_loop())
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(max(1, self.idle_timeout / 2))
+            await self.evict_idle()
+
+    async def warm_up(self):
+        """Запуск браузеров до min_size"""
+        condition = self._get_condition()
+        self._start_evictor()
+        launched = 0
+        while True:
+            async with condition:
+                if self._size() >= self.min_size:
+                    break
+                self._launching += 1
+            try:
+                browser = await self._launch_browser()
+            except Exception as e:
+                print(f"Не удалось запустить браузер пула: {e}")
+                break
+            async with condition:
+                self._idle.append((browser, time.monotonic()))
+                condition.notify()
+            launched += 1
+        if launched:
+            print(f"Пул браузеров: запущено {launched}, готово к работе {len(self._idle)}")
+
+    async def lease(self, timeout=30):
+        """Браузер из пула; None, если все заняты дольше timeout секунд или запуск не удался"""
+        condition = self._get_condition()
+        self._start_evictor()
+        deadline = time.monotonic() + timeout
+        async with condition:
+            while True:
+                while self._idle:
+                    browser, _ = self._idle.pop()
+                    if browser.is_connected():
+                        self._leased.add(browser)
+                        return browser
+                if self._size() < self.max_size:
+                    self._launching += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("Пул браузеров: все браузеры заняты")
+                    return None
+                try:
+                    await asyncio.wait_for(condition.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        try:
+            browser = await self._launch_browser()
+        except Exception as e:
+            print(f"Не удалось запустить браузер пула: {e}")
+            async with condition:
+                condition.notify()
+            return None
+        self._leased.add(browser)
+        return browser
+
+    async def release(self, browser):
+        """Возврат браузера в пул (все его контексты к этому моменту должны быть закрыты)"""
+        condition = self._get_condition()
+        async with condition:
+            self._leased.discard(browser)
+            if browser.is_connected():
+                self._idle.append((browser, time.monotonic()))
+            condition.notify()
+
+    async def evict_idle(self):
+        """Закрытие браузеров, простаивающих дольше idle_timeout, сверх min_size"""
+        condition = self._get_condition()
+        now = time.monotonic()
+        evicted = []
+        async with condition:
+            # Слева - дольше всех простаивающие
+            while self._idle and self._size() > self.min_size and now - self._idle[0][1] >= self.idle_timeout:
+                evicted.append(self._idle.popleft()[0])
+            # Упавшие браузеры убираем в любом случае
+            alive = [item for item in self._idle if item[0].is_connected()]
+            if len(alive) != len(self._idle):
+                self._idle = deque(alive)
+                condition.notify_all()
+        for browser in evicted:
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"Ошибка при закрытии браузера пула: {e}")
+        return len(evicted)
+
+    async def close(self):
+        """Закрытие простаивающих браузеров пула и остановка вытеснения"""
+        if self._evictor is not None:
+            self._evictor.cancel()
+            self._evictor = None
+        idle = [browser for browser, _ in self._idle]
+        self._idle.clear()
+        for browser in idle:
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"Ошибка при закрытии браузера пула: {e}")
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+
+from playwright.async_api import async_playwright
+
+
+class PlaywrightEngine:
+    """Единственный драйвер Playwright (async API) в отдельном потоке с циклом событий.
+
+    Все операции с браузерами выполняются как корутины в этом цикле, поэтому
+    браузеры разных аккаунтов работают одновременно, а объекты Playwright не
+    передаются между потоками. Из других потоков корутины отправляются через
+    submit (возвращает concurrent.futures.Future) или run (ожидает результат).
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._lock = threading.Lock()
+
+    @property
+    def playwright(self):
+        """Экземпляр Playwright (использовать только внутри корутин движка)"""
+        return self._playwright
+
+    def start(self):
+        """Запуск потока с циклом событий и драйвера Playwright (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(loop, started),
+                                            name="playwright-engine", daemon=True)
+            self._thread.start()
+            started.wait()
+            self._loop = loop
+            try:
+                self._playwright = asyncio.run_coroutine_threadsafe(async_playwright().start(), loop).result()
+                print("Playwright успешно инициализирован")
+            except Exception:
+                loop.call_soon_threadsafe(loop.stop)
+                self._thread.join()
+                self._thread = None
+                self._loop = None
+                raise
+
+    def _run_loop(self, loop, started):
+        """Цикл событий движка"""
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def submit(self, coroutine):
+        """Отправка корутины в цикл движка, возвращает concurrent.futures.Future"""
+        self.start()
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError("Ожидание результата из потока движка привело бы к взаимной блокировке")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def run(self, coroutine, timeout=None):
+        """Выполнение корутины в цикле движка с ожиданием результата"""
+        return self.submit(coroutine).result(timeout)
+
+    def stop(self):
+        """Остановка драйвера Playwright и цикла событий"""
+        with self._lock:
+            if self._thread is None:
+                return
+            try:
+                if self._playwright is not None:
+                    asyncio.run_coroutine_threadsafe(self._playwright.stop(), self._loop).result(timeout=30)
+            except Exception as e:
+                print(f"Ошибка при остановке Playwright: {e}")
+            finally:
+                self._playwright = None
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=30)
+                self._thread = None
+                self._loop = None
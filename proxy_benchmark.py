@@ -0,0 +1,472 @@
+"""Офлайн-бенчмарк ProxyManager.
+
+Поднимает локальные заглушки HTTP-прокси (с настраиваемой задержкой, долей
+отказов и пропускной способностью) и локальные источники списков прокси,
+после чего измеряет скорость обновления, перепроверки и выбора прокси.
+Сеть не используется. Виртуальные прокси различаются адресами 127.x.y.z,
+поэтому бенчмарк рассчитан на Linux/Windows (на macOS доступен только 127.0.0.1).
+
+Пример запуска:
+    python proxy_benchmark.py --candidates 5000 --alive-ratio 0.3 --latency 50
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import select
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from proxy_manager import ProxyManager
+from proxy_store import ProxyRecord
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Клиенты обрывают соединения по таймауту - это ожидаемо
+        pass
+
+
+class FakeProxyHandler(BaseHTTPRequestHandler):
+    """Заглушка HTTP-прокси: сама отвечает на любой запрос, не обращаясь в сеть"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        address = self.connection.getsockname()[0]
+        time.sleep(server.latency_for(address))
+
+        if random.random() < server.failure_rate:
+            # Половина отказов - ответ с ошибкой, половина - оборванное соединение
+            if random.random() < 0.5:
+                self.send_error(502)
+            self.close_connection = True
+            return
+
+        size = 64
+        if "size=" in self.path:
+            try:
+                size = int(self.path.rsplit("size=", 1)[1].split("&")[0])
+            except ValueError:
+                pass
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        self._send_throttled(size)
+
+    def do_CONNECT(self):
+        """Туннель до локальной заглушки игрового сервера (во внешнюю сеть не выходит)"""
+        server = self.server
+        time.sleep(server.latency_for(self.connection.getsockname()[0]))
+        host, _, port = self.path.rpartition(":")
+        if random.random() < server.failure_rate or not host.startswith("127."):
+            self.send_error(502)
+            self.close_connection = True
+            return
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=10)
+        except (OSError, ValueError):
+            self.send_error(502)
+            self.close_connection = True
+            return
+
+        self.send_response(200, "Connection established")
+        self.end_headers()
+        self.wfile.flush()
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 10)
+                if not readable:
+                    break
+                for sock in readable:
+                    data = sock.recv(65536)
+                    if not data:
+                        return
+                    (upstream if sock is self.connection else self.connection).sendall(data)
+        finally:
+            upstream.close()
+            self.close_connection = True
+
+    def _send_throttled(self, size):
+        """Отправка тела ответа с ограничением скорости"""
+        chunk = b"x" * 16384
+        bandwidth = self.server.bandwidth * 1024  # байт/с, 0 - без ограничения
+        sent = 0
+        started = time.monotonic()
+        while sent < size:
+            part = chunk[:min(len(chunk), size - sent)]
+            self.wfile.write(part)
+            sent += len(part)
+            if bandwidth:
+                ahead = sent / bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeProxyServer:
+    """Набор виртуальных прокси на одном порту (адреса 127.x.y.z)"""
+
+    def __init__(self, latency=50, jitter=0.5, failure_rate=0.0, bandwidth=0):
+        self.server = _QuietServer(("0.0.0.0", 0), FakeProxyHandler)
+        self.server.failure_rate = failure_rate
+        self.server.bandwidth = bandwidth
+        self.server.latency_for = self._latency_for
+        self.latency = latency
+        self.jitter = jitter
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _latency_for(self, address):
+        """Задержка виртуального прокси: у каждого адреса своя, но постоянная"""
+        rng = random.Random(address)
+        return self.latency * (1 + self.jitter * (2 * rng.random() - 1)) / 1000
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeTargetHandler(BaseHTTPRequestHandler):
+    """Заглушка игрового сервера для проверки через туннель CONNECT"""
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_HEAD
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTargetServer:
+    """Локальная замена игрового сервера"""
+
+    def __init__(self):
+        self.server = _QuietServer(("127.0.0.1", 0), FakeTargetHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BlackholeServer:
+    """Порт, который принимает соединения, но никогда не отвечает (прокси с таймаутом)"""
+
+    def __init__(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.bind(("0.0.0.0", 0))
+        self.socket.listen(1024)
+        self.port = self.socket.getsockname()[1]
+
+    def stop(self):
+        self.socket.close()
+
+
+def closed_port():
+    """Порт, на котором никто не слушает (соединение сразу отклоняется)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class FakeSourceHandler(BaseHTTPRequestHandler):
+    """Заглушка источника списка прокси с поддержкой ETag"""
+
+    def do_GET(self):
+        content = self.server.lists.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        etag = '"%s"' % hashlib.md5(content).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        # Часть реальных источников отдает список без Content-Type
+        if self.path.endswith(".txt"):
+            self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSourceServer:
+    """Локальные источники списков прокси вместо публичных"""
+
+    def __init__(self, lists):
+        self.server = _QuietServer(("127.0.0.1", 0), FakeSourceHandler)
+        self.server.lists = {path: "\n".join(lines).encode() for path, lines in lists.items()}
+        self.port = self.server.server_address[1]
+        self.urls = [f"http://127.0.0.1:{self.port}{path}" for path in lists]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def virtual_address(index):
+    """Адрес виртуального прокси с номером index (127.x.y.z без .0 и .255)"""
+    index, last = divmod(index, 254)
+    index, middle = divmod(index, 256)
+    return f"127.{1 + index}.{middle}.{last + 1}"
+
+
+def build_candidates(count, alive_ratio, silent_ratio, proxy_port, silent_port, dead_port):
+    """Список кандидатов: рабочие, зависающие и отклоняющие соединение"""
+    candidates = []
+    for i in range(count):
+        roll = random.random()
+        if roll < alive_ratio:
+            port = proxy_port
+        elif roll < alive_ratio + silent_ratio:
+            port = silent_port
+        else:
+            port = dead_port
+        candidates.append(f"{virtual_address(i)}:{port}")
+    return candidates
+
+
+def make_manager(workdir, args, target_url=None):
+    """ProxyManager, настроенный только на локальные ресурсы"""
+    manager = ProxyManager(max_workers=args.workers, check_timeout=args.timeout,
+                           proxies_file=os.path.join(workdir, "proxies.json"))
+    manager.check_url = "http://benchmark.local/ip"
+    manager.throughput_url = "http://benchmark.local/payload?size={size}"
+    # Проверка через CONNECT до локальной заглушки игрового сервера или простая проверка
+    manager.check_target = target_url if args.check in ("target", "handshake") else None
+    manager.handshake_probe = args.check == "handshake"
+    manager.target_pool_size = None
+    # Фоновое пополнение обращалось бы к настоящим источникам
+    manager.low_water_mark = 0
+    return manager
+
+
+def bench_refresh(args, workdir, report):
+    """Обновление из источников, время до первого рабочего прокси и перепроверка"""
+    proxy_server = FakeProxyServer(args.latency, args.jitter, args.failure_rate, args.bandwidth).start()
+    target_server = FakeTargetServer().start()
+    silent_server = BlackholeServer()
+    candidates = build_candidates(args.candidates, args.alive_ratio, args.silent_ratio,
+                                  proxy_server.port, silent_server.port, closed_port())
+    # Раскладываем кандидатов по пяти источникам, как в реальной конфигурации
+    # Последний источник отдается без Content-Type
+    lists = {f"/source{i}.txt" if i < 4 else f"/source{i}": candidates[i::5] for i in range(5)}
+    source_server = FakeSourceServer(lists).start()
+
+    try:
+        manager = make_manager(workdir, args, target_server.url)
+        manager.sources = source_server.urls
+
+        result = {}
+        # Процессорное время всего процесса, включая заглушки, - для сравнения способов проверки
+        cpu_started = time.process_time()
+        started = time.monotonic()
+        worker = threading.Thread(target=lambda: result.setdefault("ok", manager.update_proxies(force=True)))
+        worker.start()
+        first_usable = None
+        while worker.is_alive():
+            if first_usable is None and manager.proxies.working_count:
+                first_usable = time.monotonic() - started
+            time.sleep(0.001)
+        worker.join()
+        elapsed = time.monotonic() - started
+        cpu_elapsed = time.process_time() - cpu_started
+
+        report["refresh"] = {
+            "candidates": len(candidates),
+            "working": manager.proxies.working_count,
+            "seconds": round(elapsed, 3),
+            "candidates_per_sec": round(len(candidates) / elapsed, 1),
+            "cpu_seconds": round(cpu_elapsed, 3),
+            "time_to_first_usable": round(first_usable, 3) if first_usable is not None else None
+        }
+        report["sources"] = manager.get_source_stats()
+
+        # Повторное обновление: источники не изменились, кэш нерабочих заполнен
+        started = time.monotonic()
+        manager.update_proxies(force=True)
+        report["refresh_unchanged"] = {"seconds": round(time.monotonic() - started, 3)}
+
+        # Перезапуск: состояние источников и негативный кэш читаются с диска
+        restarted = make_manager(workdir, args, target_server.url)
+        restarted.sources = source_server.urls
+        started = time.monotonic()
+        restarted.update_proxies(force=True)
+        report["refresh_after_restart"] = {"seconds": round(time.monotonic() - started, 3)}
+
+        pool_size = len(manager.proxies)
+        started = time.monotonic()
+        manager.verify_proxies()
+        elapsed = time.monotonic() - started
+        report["verify"] = {
+            "proxies": pool_size,
+            "seconds": round(elapsed, 3),
+            "proxies_per_sec": round(pool_size / elapsed, 1) if elapsed else None
+        }
+
+        if args.throughput:
+            manager.throughput_size = args.throughput_size
+            started = time.monotonic()
+            measured = manager.measure_pool_throughput(limit=args.throughput)
+            elapsed = time.monotonic() - started
+            speeds = sorted(record.throughput_kbps for record in manager.proxies if record.throughput_kbps)
+            report["throughput"] = {
+                "measured": measured,
+                "seconds": round(elapsed, 3),
+                "median_kbps": speeds[len(speeds) // 2] if speeds else None
+            }
+    finally:
+        source_server.stop()
+        target_server.stop()
+        silent_server.stop()
+        proxy_server.stop()
+
+
+def bench_selection(args, workdir, report):
+    """Скорость выбора прокси и расход памяти на пулах разного размера"""
+    report["selection"] = []
+    for size in args.sizes:
+        manager = make_manager(tempfile.mkdtemp(dir=workdir), args)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(size):
+            record = ProxyRecord(f"http://{virtual_address(i)}:8080", "http", "benchmark")
+            record.working = random.random() < 0.8
+            record.latency = random.uniform(20, 3000)
+            record.success = random.randint(1, 20)
+            record.failure = random.randint(0, 5)
+            manager.proxies.add(record)
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        calls = args.selections
+        started = time.perf_counter()
+        for _ in range(calls):
+            manager.get_random_proxy()
+        select_us = (time.perf_counter() - started) / calls * 1e6
+
+        started = time.perf_counter()
+        for i in range(calls):
+            manager.acquire_proxy(f"account{i % 1000}")
+        acquire_us = (time.perf_counter() - started) / calls * 1e6
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            manager.get_proxy_stats()
+        stats_us = (time.perf_counter() - started) / calls * 1e6
+
+        report["selection"].append({
+            "pool_size": size,
+            "get_random_proxy_us": round(select_us, 2),
+            "acquire_proxy_us": round(acquire_us, 2),
+            "get_proxy_stats_us": round(stats_us, 2),
+            "memory_mb": round(memory / 1024 / 1024, 2),
+            "bytes_per_proxy": round(memory / size)
+        })
+
+
+def print_report(report):
+    """Вывод результатов в читаемом виде"""
+    if "refresh" in report:
+        refresh = report["refresh"]
+        print(f"Обновление: {refresh['candidates']} кандидатов за {refresh['seconds']} с "
+              f"({refresh['candidates_per_sec']} кандидатов/с, процессор {refresh['cpu_seconds']} с), "
+              f"рабочих: {refresh['working']}")
+        print(f"Время до первого рабочего прокси: {refresh['time_to_first_usable']} с")
+        print(f"Повторное обновление без изменений: {report['refresh_unchanged']['seconds']} с")
+        print(f"Обновление после перезапуска: {report['refresh_after_restart']['seconds']} с")
+        verify = report["verify"]
+        print(f"Перепроверка: {verify['proxies']} прокси за {verify['seconds']} с "
+              f"({verify['proxies_per_sec']} прокси/с)")
+    if "throughput" in report:
+        throughput = report["throughput"]
+        print(f"Замер скорости: {throughput['measured']} прокси за {throughput['seconds']} с, "
+              f"медиана {throughput['median_kbps']} КБ/с")
+    for row in report.get("selection", []):
+        print(f"Пул {row['pool_size']}: get_random_proxy {row['get_random_proxy_us']} мкс, "
+              f"acquire_proxy {row['acquire_proxy_us']} мкс, get_proxy_stats {row['get_proxy_stats_us']} мкс, "
+              f"память {row['memory_mb']} МБ ({row['bytes_per_proxy']} байт/прокси)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк ProxyManager")
+    parser.add_argument("--candidates", type=int, default=2000, help="Количество кандидатов в источниках")
+    parser.add_argument("--alive-ratio", type=float, default=0.3, help="Доля рабочих кандидатов")
+    parser.add_argument("--silent-ratio", type=float, default=0.1, help="Доля зависающих кандидатов (таймаут)")
+    parser.add_argument("--latency", type=float, default=50, help="Средняя задержка рабочих прокси (мс)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Разброс задержки между прокси (доля)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Доля отказов рабочих прокси")
+    parser.add_argument("--bandwidth", type=float, default=0, help="Пропускная способность прокси (КБ/с, 0 - без ограничения)")
+    parser.add_argument("--throughput", type=int, default=0, help="Замерить скорость стольких прокси")
+    parser.add_argument("--throughput-size", type=int, default=256 * 1024, help="Размер загрузки при замере (байт)")
+    parser.add_argument("--workers", type=int, default=200, help="Параллельных проверок")
+    parser.add_argument("--timeout", type=float, default=2, help="Таймаут проверки (секунды)")
+    parser.add_argument("--check", choices=["target", "simple", "handshake"], default="target",
+                        help="Проверка через CONNECT до заглушки игрового сервера, простым запросом "
+                             "или облегченная (только строка статуса)")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+                        help="Размеры пула для замера выбора")
+    parser.add_argument("--selections", type=int, default=10000, help="Вызовов выбора на каждый размер пула")
+    parser.add_argument("--skip-refresh", action="store_true", help="Не запускать замер обновления")
+    parser.add_argument("--json", help="Сохранить результаты в JSON файл")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="proxy_benchmark_")
+    report = {}
+    try:
+        if not args.skip_refresh:
+            bench_refresh(args, workdir, report)
+        if args.sizes:
+            bench_selection(args, workdir, report)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,265 @@
+import base64
+import copy
+import itertools
 import json
 import os
+import queue
 import random
+import socket
+import ssl
+import statistics
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
+from urllib.parse import unquote, urlsplit
+from requests.adapters import HTTPAdapter
+
+from proxy_store import (ProxyJournal, ProxyRecord, ProxyStore, add_latency_sample, browser_supports_proxy,
+                         parse_proxy_url, percentile, proxy_key, write_json_atomic)
 
 
 class ProxyManager:
-    def __init__(self):
-        self.proxies_file = "proxies.json"
+    def __init__(self, max_workers=200, check_timeout=5, proxies_file="proxies.json"):
+        self.proxies_file = proxies_file
+        # Снимок пула + журнал отдельных изменений
+        self._journal = ProxyJournal(self.proxies_file)
+        self.journal_compact_threshold = 5000  # После стольких изменений журнал сворачивается в снимок
+        self._save_lock = threading.Lock()
+        self._compacting = False
+        self.last_update = None
+        # Состояние источников: ETag/Last-Modified и время последней загрузки
+        self.sources_state = {}
         self.proxies = self.load_proxies()
+        # Негативный кэш: недавно не прошедшие проверку адреса (host:port -> время истечения)
+        self.dead_proxies_file = os.path.join(os.path.dirname(self.proxies_file), "dead_proxies.json")
+        self.dead_ttl = 6 * 3600
+        self.dead_proxies = self.load_dead_proxies()
         self.user_agents = self.get_user_agents()
-        self.last_update = None
+        # Размеры окна для постоянных профилей аккаунтов
+        self.viewports = [
+            {"width": 1280, "height": 720},
+            {"width": 1366, "height": 768},
+            {"width": 1440, "height": 900},
+            {"width": 1536, "height": 864},
+            {"width": 1600, "height": 900},
+            {"width": 1920, "height": 1080},
+        ]
+
+        # Бесплатные источники списков прокси
+        self.sources = [
+            "https://www.proxy-list.download/api/v1/get?type=http",
+            "https://api.proxyscrape.com/v2/?request=getproxies&protocol=http&timeout=10000&country=all",
+            "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt",
+            "https://raw.githubusercontent.com/ShiftyTR/Proxy-List/master/http.txt",
+            "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt"
+        ]
+        self.source_timeout = 10
+        # Статистика источников: сначала обрабатываются источники с большей долей рабочих прокси,
+        # неработающие и бесполезные источники загружаются реже
+        self.source_stats_alpha = 0.3  # Вес последнего обновления в доле рабочих прокси источника
+        self.min_source_yield = 0.01  # При меньшей доле рабочих прокси источник откладывается
+        self.min_source_samples = 200  # Сколько проверенных кандидатов нужно для оценки источника
+        self.low_yield_backoff = 12 * 3600  # Пауза для бесполезного источника (секунды)
+        self.source_error_backoff = 600  # Пауза после ошибки загрузки, удваивается при повторных ошибках
+        self.source_max_backoff = 24 * 3600
+        # Обновление останавливается, как только в пуле наберется столько рабочих прокси
+        self.target_pool_size = 500
+        self._lock = threading.RLock()
+        # Оповещение ожидающих выбора прокси о появлении рабочих прокси или освобождении нагрузки
+        self._pool_changed = threading.Condition(self._lock)
+        self._refresh_lock = threading.Lock()  # Одновременно выполняется только одно обновление
+
+        # Фоновое пополнение пула: запускается, когда рабочих прокси меньше порога
+        self.low_water_mark = 20
+        self.refill_min_interval = 300  # Не чаще одного пополнения за столько секунд
+        self._refill_thread = None
+        self._last_refill = 0
+
+        # Параметры движка проверки прокси
+        self.check_url = "http://httpbin.org/ip"
+        # Проверка через туннель CONNECT до игрового сервера (None - простая проверка через check_url).
+        # Для тестов можно указать локальную заглушку, например http://127.0.0.1:8080/
+        self.check_target = "https://ru.mlgame.org/"
+        self.check_target_verify_tls = True
+        # Облегченная проверка: один запрос (CONNECT до check_target или GET check_url) через сырой сокет
+        # и разбор только строки статуса - для отсева больших списков кандидатов
+        self.handshake_probe = False
+        self._handshake_requests = {}  # (check_target, check_url) -> готовый запрос в байтах
+        self._resolved_hosts = {}  # Имя хоста прокси -> (семейство адресов, IP)
+
+        # Замер пропускной способности (необязательный): загрузка файла заданного размера через прокси.
+        # {size} в адресе заменяется размером в байтах; для тестов подходит локальная заглушка
+        self.throughput_url = "https://speed.cloudflare.com/__down?bytes={size}"
+        self.throughput_size = 512 * 1024
+        self.throughput_timeout = 30
+        self.throughput_workers = 8  # Одновременных замеров, чтобы не упереться в собственный канал
+        self.throughput_checks = False  # Замерять пропускную способность в фоновом планировщике
+        self.throughput_ttl = 6 * 3600  # Как часто повторять замер для одного прокси
+        self.min_throughput_kbps = None  # Минимальная скорость прокси при выборе (КБ/с)
+        self.game_payload_kb = 5000  # Объем загрузки при входе в игру, учитывается в оценке прокси
+        self.max_workers = max_workers  # Максимум одновременных проверок
+        self.check_timeout = check_timeout  # Предельное время одной проверки (секунды)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+
+        # Параметры выбора прокси
+        self.latency_alpha = 0.3  # Вес новой задержки в скользящем среднем
+        self.selection_k = 3  # Из скольких случайных прокси выбирается лучший
+
+        # Адаптивные таймауты: p95 задержки прокси × timeout_factor, в заданных пределах
+        self.latency_sample_size = 16  # Сколько последних замеров задержки хранится для прокси
+        self.timeout_factor = 3
+        self.check_timeout_min = 1.0  # Пределы таймаута проверки (секунды)
+        self.check_timeout_max = 2 * check_timeout
+
+        # Параметры фоновой перепроверки
+        self.recheck_base_ttl = 600  # TTL после первой успешной проверки (секунды)
+        self.recheck_max_ttl = 6 * 3600  # Максимальный TTL для стабильных прокси
+        self.retry_base_delay = 60  # Задержка перед повторной проверкой после неудачи
+        self.max_failures = 5  # После стольких неудач подряд прокси удаляется
+        self.recheck_rate = 5  # Проверок в секунду в фоне
+        self.recheck_interval = 5  # Период планировщика (секунды)
+        self._scheduler_thread = None
+        self._scheduler_stop = threading.Event()
+
+        # Параметры предохранителя (circuit breaker) по результатам использования прокси
+        self.breaker_threshold = 3  # Неудач подряд до ухода прокси в карантин
+        self.breaker_cooldown = 300  # Длительность первого карантина (секунды)
+        self.breaker_max_cooldown = 3600
+        # Вызывается как on_quarantine(proxy_url, usernames) при уходе прокси в карантин
+        self.on_quarantine = None
+
+        # Распределение аккаунтов по прокси
+        self.max_accounts_per_proxy = 3  # Сколько запущенных аккаунтов может работать через один прокси
+        self.assignment_sample = 64  # Среди скольких случайных рабочих прокси ищется наименее загруженный
+        self._proxy_load = {}  # host:port -> множество аккаунтов
+        self._account_proxy = {}  # аккаунт -> host:port
+
+        # Быстрая проверка прокси непосредственно перед запуском браузера
+        self.preflight_timeout = 1.0  # Предельное время TCP-соединения с прокси (секунды)
+        self.fallback_chain_length = 4  # Сколько запасных прокси проверяется вместе с основным
+        self.preflight_workers = 16  # Отдельный пул: проверки при запуске не ждут массовые проверки пула
+        self._preflight_executor = None
 
     def load_proxies(self):
-        """Загрузка списка прокси из JSON файла"""
+        """Загрузка списка прокси: снимок из JSON файла и изменения из журнала"""
         try:
-            if os.path.exists(self.proxies_file):
-                with open(self.proxies_file, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    return data.get("proxies", [])
-            return []
+            data, operations = self._journal.load()
+            try:
+                # Восстанавливаем время обновления и состояние источников после перезапуска
+                if data.get("last_update"):
+                    self.last_update = datetime.strptime(data["last_update"], "%Y-%m-%d %H:%M:%S")
+                self.sources_state = data.get("sources", {})
+                store = ProxyStore(ProxyRecord.from_dict(item) for item in data.get("proxies", []))
+            except Exception as e:
+                # Снимок не перезаписывается пустым: он откладывается, а изменения из журнала применяются
+                print(f"Снимок прокси поврежден: {e}")
+                self._journal.set_aside_snapshot()
+                self.last_update = None
+                self.sources_state = {}
+                store = ProxyStore()
+
+            for operation in operations:
+                try:
+                    if operation.get("op") == "upsert":
+                        record = ProxyRecord.from_dict(operation["proxy"])
+                        store.remove(record.url)
+                        store.add(record)
+                    elif operation.get("op") == "remove":
+                        store.remove(operation["url"])
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    print(f"Пропущена поврежденная запись журнала прокси: {e}")
+            return store
         except Exception as e:
             print(f"Ошибка при загрузке прокси: {e}")
-            return []
+            return ProxyStore()
 
-    def save_proxies(self, proxies):
-        """Сохранение списка прокси в JSON файл"""
+    def save_proxies(self):
+        """Сохранение полного снимка прокси (атомарно, с заменой журнала)"""
         try:
-            with open(self.proxies_file, 'w', encoding='utf-8') as file:
-                json.dump({"proxies": proxies, "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
-                          file, ensure_ascii=False, indent=2)
+            with self._save_lock:
+                with self._lock:
+                    data = {
+                        "proxies": self.proxies.to_list(),
+                        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "last_update": self.last_update.strftime("%Y-%m-%d %H:%M:%S") if self.last_update else None,
+                        # Копия: снимок пишется вне блокировки, а потоки загрузки меняют состояние источников
+                        "sources": copy.deepcopy(self.sources_state)
+                    }
+                    # Изменения, сделанные после этого момента, попадут уже в новый журнал
+                    self._journal.rotate()
+                self._journal.write_snapshot(data)
             return True
         except Exception as e:
             print(f"Ошибка при сохранении прокси: {e}")
             return False
 
+    def _journal_upsert(self, record):
+        """Запись изменения одного прокси в журнал"""
+        self._journal_append({"op": "upsert", "proxy": record.to_dict()})
+
+    def _journal_remove(self, proxy_url):
+        """Запись удаления прокси в журнал"""
+        self._journal_append({"op": "remove", "url": proxy_url})
+
+    def _journal_append(self, operation):
+        try:
+            with self._lock:
+                self._journal.append(operation)
+                need_compact = (self._journal.entries >= self.journal_compact_threshold
+                                and not self._compacting)
+                if need_compact:
+                    self._compacting = True
+            if need_compact:
+                # Сворачиваем журнал в снимок в фоне, не задерживая вызывающий код
+                threading.Thread(target=self._compact_journal, name="proxy-journal", daemon=True).start()
+        except Exception as e:
+            print(f"Ошибка при записи журнала прокси: {e}")
+
+    def _compact_journal(self):
+        try:
+            self.save_proxies()
+        finally:
+            self._compacting = False
+
+    def load_dead_proxies(self):
+        """Загрузка негативного кэша прокси (просроченные записи отбрасываются)"""
+        try:
+            if os.path.exists(self.dead_proxies_file):
+                with open(self.dead_proxies_file, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                now = time.time()
+                return {key: expires for key, expires in data.items() if expires > now}
+            return {}
+        except Exception as e:
+            print(f"Ошибка при загрузке списка нерабочих прокси: {e}")
+            return {}
+
+    def save_dead_proxies(self):
+        """Сохранение негативного кэша прокси"""
+        try:
+            now = time.time()
+            with self._lock:
+                data = {key: expires for key, expires in self.dead_proxies.items() if expires > now}
+                self.dead_proxies = data
+            write_json_atomic(self.dead_proxies_file, data)
+            return True
+        except Exception as e:
+            print(f"Ошибка при сохранении списка нерабочих прокси: {e}")
+            return False
+
+    def _is_known_dead(self, proxy_url):
+        """Проверка, не проваливал ли адрес проверку недавно"""
+        expires = self.dead_proxies.get(proxy_key(proxy_url))
+        return expires is not None and expires > time.time()
+
+    def _mark_dead(self, proxy_url):
+        """Добавление адреса в негативный кэш"""
+        self.dead_proxies[proxy_key(proxy_url)] = round(time.time() + self.dead_ttl)
+
     def update_proxies(self, force=False):
         """Обновление списка прокси из бесплатных источников"""
         # Проверяем, нужно ли обновлять (не чаще раза в день)
@@ -42,47 +267,93 @@ class ProxyManager:
             print("Обновление прокси не требуется, последнее обновление:", self.last_update)
             return False
 
-        proxies = []
+        if not self._refresh_lock.acquire(blocking=False):
+            print("Обновление прокси уже выполняется")
+            return False
+
+        stop = threading.Event()
+        # Кандидаты из более полезных источников проверяются в первую очередь
+        candidates = queue.PriorityQueue(maxsize=self.max_workers * 4)
         try:
-            # Источник 1: Прокси из открытых API (примеры)
-            sources = [
-                "https://www.proxy-list.download/api/v1/get?type=http",
-                "https://api.proxyscrape.com/v2/?request=getproxies&protocol=http&timeout=10000&country=all",
-                "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt",
-                "https://raw.githubusercontent.com/ShiftyTR/Proxy-List/master/http.txt",
-                "https://raw.githubusercontent.com/monosans/proxy-list/main/proxies/http.txt"
-            ]
+            with self._lock:
+                working_count = self.proxies.working_count
+
+            sources = self._active_sources()
+            postponed = len(self.sources) - len(sources)
+            if postponed:
+                print(f"Источников отложено: {postponed}")
+            run_stats = {source: {"candidates": 0, "checked": 0, "passed": 0, "latencies": [],
+                                  "error": False, "fetch_ms": None}
+                         for source in sources}
+
+            # Загружаем все источники параллельно: каждый поток разбирает ответ построчно
+            # и сразу передает кандидатов на проверку
+            sequence = itertools.count()
+            fetch_executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="proxy-source")
+            fetches = {fetch_executor.submit(self._fetch_source, source, candidates, stop,
+                                             priority, sequence, run_stats[source]): source
+                       for priority, source in enumerate(sources)}
+            fetch_executor.shutdown(wait=False)
+
+            candidate_sources = {}
+            candidates_skipped = [0]
+            stopped_early = False
+            print("Проверка прокси по мере загрузки источников...")
+            for proxy, is_working, latency, target in self.check_proxies(
+                    self._iter_candidates(candidates, len(fetches), candidate_sources, candidates_skipped,
+                                          run_stats)):
+                source_run = run_stats[candidate_sources[proxy]]
+                source_run["checked"] += 1
+                if is_working:
+                    source_run["passed"] += 1
+                    if latency is not None:
+                        source_run["latencies"].append(latency)
+                if not is_working:
+                    # Уже известный прокси не удаляем сразу, а учитываем неудачу в его истории
+                    with self._lock:
+                        record = self.proxies.get(proxy)
+                        if record is not None:
+                            self._record_check(record, False, target=target)
+                        else:
+                            self._mark_dead(proxy)
+                    continue
+                # Публикуем рабочий прокси в пул сразу, не дожидаясь конца обновления
+                if self._publish_proxy(proxy, candidate_sources[proxy], latency, target):
+                    working_count += 1
+                if self.target_pool_size and working_count >= self.target_pool_size:
+                    print(f"Достигнут целевой размер пула: {working_count}")
+                    stopped_early = True
+                    break
 
+            stop.set()
+            changed = {fetches[future] for future in fetches if future.result()}
+            unchanged = set(sources) - changed
+            if unchanged:
+                print(f"Источников без новых данных: {len(unchanged)}")
             for source in sources:
-                try:
-                    print(f"Получение прокси из источника: {source}")
-                    response = requests.get(source, timeout=10)
-                    if response.status_code == 200:
-                        content = response.text
-                        # Извлекаем прокси из содержимого
-                        lines = content.strip().split('\n')
-                        for line in lines:
-                            if ':' in line:
-                                ip, port = line.strip().split(':')
-                                proxy = f"http://{ip}:{port}"
-                                if self.check_proxy(proxy):
-                                    proxies.append({
-                                        "url": proxy,
-                                        "type": "http",
-                                        "source": source,
-                                        "added": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                        "last_check": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                        "working": True
-                                    })
-                except Exception as e:
-                    print(f"Ошибка при получении прокси из {source}: {e}")
-
-            # Сохраняем обновленный список
-            if proxies:
-                self.proxies = proxies
-                self.save_proxies(proxies)
+                self._update_source_stats(source, run_stats[source])
+
+            with self._lock:
+                # Прокси, исчезнувшие из обновленных источников, удаляем.
+                # При досрочной остановке часть списка не прочитана - оставляем пул как есть
+                if not stopped_early:
+                    for record in self.proxies:
+                        if record.source in changed and record.url not in candidate_sources:
+                            self.proxies.remove(record.url)
+            self._drop_dead_proxies()
+            with self._lock:
+                proxies_count = len(self.proxies)
+            skipped = candidates_skipped[0]
+            if skipped:
+                print(f"Пропущено заведомо нерабочих прокси: {skipped}")
+
+            # Сохраняем обновленный список вместе с состоянием источников
+            if proxies_count:
                 self.last_update = datetime.now()
-                print(f"Обновлено {len(proxies)} прокси")
+            self.save_proxies()
+            self.save_dead_proxies()
+            if proxies_count:
+                print(f"Обновлено {proxies_count} прокси")
                 return True
             else:
                 print("Не удалось получить новые прокси")
@@ -91,54 +362,985 @@ class ProxyManager:
         except Exception as e:
             print(f"Ошибка при обновлении прокси: {e}")
             return False
+        finally:
+            stop.set()
+            self._refresh_lock.release()
+
+    def request_refill(self):
+        """Запуск обновления пула в фоновом потоке (если оно еще не выполняется), возвращает True при запуске"""
+        with self._lock:
+            if self._refill_thread and self._refill_thread.is_alive():
+                return False
+            if time.monotonic() - self._last_refill < self.refill_min_interval and self._last_refill:
+                return False
+            self._last_refill = time.monotonic()
+            self._refill_thread = threading.Thread(target=self.update_proxies, kwargs={"force": True},
+                                                   name="proxy-refill", daemon=True)
+            self._refill_thread.start()
+            print(f"Рабочих прокси меньше {self.low_water_mark}, запущено фоновое пополнение пула")
+            return True
+
+    def _refill_if_low(self):
+        """Пополнение пула в фоне, если рабочих прокси меньше порога"""
+        with self._lock:
+            if self.proxies.working_count < self.low_water_mark:
+                self.request_refill()
+
+    def _pick_with_deadline(self, pick, timeout):
+        """Выбор прокси с ожиданием не дольше timeout секунд; обновление пула выполняется только в фоне"""
+        deadline = time.monotonic() + (timeout or 0)
+        with self._pool_changed:
+            while True:
+                result = pick()
+                self._refill_if_low()
+                if result is not None:
+                    return result
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._pool_changed.wait(remaining)
+
+    def _iter_candidates(self, candidates, sources_count, candidate_sources, skipped, run_stats):
+        """Генератор кандидатов из очереди, пока все источники не будут загружены"""
+        finished = 0
+        while finished < sources_count:
+            _, _, item = candidates.get()
+            if item is None:
+                finished += 1
+                continue
+            proxy, source = item
+            if proxy in candidate_sources:
+                continue
+            candidate_sources[proxy] = source
+            run_stats[source]["candidates"] += 1
+            # Недавно не прошедшие проверку адреса пропускаем без сетевого запроса
+            if proxy not in self.proxies and self._is_known_dead(proxy):
+                skipped[0] += 1
+                continue
+            yield proxy
+
+    def _publish_proxy(self, proxy_url, source, latency=None, target=None):
+        """Добавление рабочего прокси в пул, возвращает True, если рабочих прокси стало больше"""
+        with self._lock:
+            self.dead_proxies.pop(proxy_key(proxy_url), None)
+            record = self.proxies.get(proxy_url)
+            proxy_type = proxy_url.split("://", 1)[0]
+            if record is not None:
+                was_working = record.working
+                if record.url != proxy_url:
+                    # Тот же адрес с другими учетными данными или схемой - сохраняем последние
+                    record.url = proxy_url
+                    record.type = proxy_type
+                self._record_check(record, True, latency, target)
+            else:
+                was_working = False
+                record = self.proxies.add(ProxyRecord(proxy_url, proxy_type, source))
+                self._record_check(record, True, latency, target)
+            self._journal_upsert(record)
+            if not was_working:
+                self._pool_changed.notify_all()
+            return not was_working
+
+    def _fetch_source(self, source, candidates, stop, priority, sequence, run):
+        """Потоковая загрузка списка прокси из источника, возвращает True, если список получен полностью"""
+        headers = {}
+        # Условный запрос имеет смысл, только если в пуле остались прокси из этого источника
+        with self._lock:
+            state = self.sources_state.setdefault(source, {})
+            if self.proxies.count_source(source) > 0:
+                if state.get("etag"):
+                    headers["If-None-Match"] = state["etag"]
+                if state.get("last_modified"):
+                    headers["If-Modified-Since"] = state["last_modified"]
+
+        started = time.monotonic()
+        try:
+            print(f"Получение прокси из источника: {source}")
+            with requests.get(source, headers=headers, timeout=self.source_timeout, stream=True) as response:
+                if response.status_code == 304:
+                    print(f"Список не изменился: {source}")
+                    with self._lock:
+                        state["last_fetch"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    return False
+                if response.status_code != 200:
+                    print(f"Источник {source} вернул код {response.status_code}")
+                    run["error"] = True
+                    return False
+
+                # Без charset в Content-Type (application/octet-stream или вовсе без заголовка)
+                # iter_lines вернет bytes - списки прокси читаем как UTF-8
+                response.encoding = response.encoding or "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    if stop.is_set():
+                        return False
+                    proxy = self._parse_proxy_line(line or "")
+                    if proxy and not self._put_candidate(candidates, (priority, next(sequence), (proxy, source)),
+                                                         stop):
+                        return False
+
+                with self._lock:
+                    state.update({
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "last_fetch": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    })
+                return True
+        except Exception as e:
+            # При ошибке оставляем в пуле прокси, ранее полученные из этого источника
+            print(f"Ошибка при получении прокси из {source}: {e}")
+            run["error"] = True
+            return False
+        finally:
+            run["fetch_ms"] = round((time.monotonic() - started) * 1000)
+            # Сообщаем потребителю, что источник обработан
+            self._put_candidate(candidates, (priority, next(sequence), None), stop)
+
+    def _source_priority(self, source):
+        """Ключ порядка источников: больше доля рабочих прокси - раньше загрузка и проверка"""
+        stats = self.sources_state.get(source, {}).get("stats", {})
+        # Источники без статистики обрабатываются первыми, чтобы быстрее получить их оценку
+        return -stats.get("yield", 1.0)
+
+    def _active_sources(self):
+        """Источники для текущего обновления (без отложенных), от более полезных к менее"""
+        now = time.time()
+        active = [source for source in self.sources
+                  if self.sources_state.get(source, {}).get("stats", {}).get("retry_after", 0) <= now]
+        if not active:
+            # Отложены все источники - загружаем все, чтобы обновление не было пустым
+            active = list(self.sources)
+        return sorted(active, key=self._source_priority)
 
-    def check_proxy(self, proxy_url, timeout=5):
+    def _update_source_stats(self, source, run):
+        """Учет результатов обновления в статистике источника и расчет паузы до следующей загрузки"""
+        with self._lock:
+            stats = self.sources_state.setdefault(source, {}).setdefault("stats", {})
+            now = time.time()
+            stats["fetches"] = stats.get("fetches", 0) + 1
+            stats["fetch_ms"] = run["fetch_ms"]
+            if run["error"]:
+                stats["errors"] = stats.get("errors", 0) + 1
+                stats["error_streak"] = stats.get("error_streak", 0) + 1
+                backoff = min(self.source_max_backoff, self.source_error_backoff * 2 ** min(stats["error_streak"] - 1, 10))
+                stats["retry_after"] = round(now + backoff)
+                print(f"Источник {source} отложен на {backoff} с после ошибок загрузки ({stats['error_streak']} подряд)")
+                return
+
+            stats["error_streak"] = 0
+            stats["retry_after"] = 0
+            if run["candidates"]:
+                stats["candidates"] = run["candidates"]
+            if run["checked"]:
+                rate = run["passed"] / run["checked"]
+                previous = stats.get("yield")
+                alpha = self.source_stats_alpha
+                stats["yield"] = round(rate if previous is None else alpha * rate + (1 - alpha) * previous, 4)
+                stats["checked"] = stats.get("checked", 0) + run["checked"]
+                stats["passed"] = stats.get("passed", 0) + run["passed"]
+                if run["latencies"]:
+                    stats["latency_median"] = round(statistics.median(run["latencies"]), 1)
+            if stats.get("checked", 0) >= self.min_source_samples and stats.get("yield", 1.0) < self.min_source_yield:
+                stats["retry_after"] = round(now + self.low_yield_backoff)
+                print(f"Источник {source} дает мало рабочих прокси ({stats['yield']:.1%}), "
+                      f"отложен на {self.low_yield_backoff} с")
+
+    def get_source_stats(self):
+        """Статистика источников: кандидаты, доля рабочих, медианная задержка, время загрузки, ошибки"""
+        with self._lock:
+            return {source: dict(self.sources_state.get(source, {}).get("stats", {})) for source in self.sources}
+
+    def _put_candidate(self, candidates, item, stop):
+        """Помещение кандидата в очередь без вечной блокировки при остановке обновления"""
+        while True:
+            try:
+                candidates.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if stop.is_set():
+                    return False
+
+    def _get_session(self):
+        """Получение сессии requests для текущего потока (соединения переиспользуются)"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.trust_env = False  # Не подхватываем системные прокси
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _get_executor(self):
+        """Общий пул потоков для проверки прокси"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="proxy-check")
+            return self._executor
+
+    def _get_preflight_executor(self):
+        """Небольшой пул потоков для быстрой проверки прокси перед запуском браузера"""
+        with self._executor_lock:
+            if self._preflight_executor is None:
+                self._preflight_executor = ThreadPoolExecutor(max_workers=self.preflight_workers,
+                                                              thread_name_prefix="proxy-preflight")
+            return self._preflight_executor
+
+    def check_proxy(self, proxy_url, timeout=None):
         """Проверка работоспособности прокси"""
+        is_working, _, _ = self._probe_proxy(proxy_url, timeout)
+        return is_working
+
+    def get_proxy_timeout(self, proxy_url, multiplier=1, default=None, minimum=None, maximum=None):
+        """Таймаут (секунды) по наблюдаемой задержке прокси.
+
+        p95 последних замеров × timeout_factor × multiplier (во сколько раз операция
+        дольше проверки), в пределах [minimum, maximum]. Без замеров возвращается default.
+        """
+        minimum = self.check_timeout_min if minimum is None else minimum
+        maximum = self.check_timeout_max if maximum is None else maximum
+        with self._lock:
+            record = self.proxies.get(proxy_url) if proxy_url else None
+            samples = record.latency_samples if record is not None else None
+            p95 = percentile(samples, 0.95) if samples else None
+        if p95 is None:
+            return self.check_timeout if default is None else default
+        return min(maximum, max(minimum, p95 / 1000 * self.timeout_factor * multiplier))
+
+    def _probe_proxy(self, proxy_url, timeout=None):
+        """Проверка прокси, возвращает (результат, задержка в мс, замеры до игрового сервера или None)"""
+        if timeout is None:
+            # Быстрые прокси отбраковываются быстро, медленным, но рабочим дается больше времени
+            timeout = self.get_proxy_timeout(proxy_url)
+        if proxy_url.startswith("socks"):
+            is_working, latency = self._probe_socks(proxy_url, timeout)
+            return is_working, latency, None
+        if self.handshake_probe:
+            is_working, latency = self._probe_handshake(proxy_url, timeout)
+            return is_working, latency, None
+        if self.check_target:
+            target = self._probe_target(proxy_url, timeout)
+            return target["ok"], target.get("total_ms"), target
+        is_working, latency = self._probe_check_url(proxy_url, timeout)
+        return is_working, latency, None
+
+    def _handshake_request(self):
+        """Запрос облегченной проверки (строится один раз для текущих настроек)"""
+        settings = (self.check_target, self.check_url)
+        request = self._handshake_requests.get(settings)
+        if request is None:
+            if self.check_target:
+                target = urlsplit(self.check_target)
+                address = f"{target.hostname}:{target.port or (443 if target.scheme == 'https' else 80)}"
+                request = f"CONNECT {address} HTTP/1.1\r\nHost: {address}\r\n\r\n".encode()
+            else:
+                target = urlsplit(self.check_url)
+                request = (f"GET {self.check_url} HTTP/1.1\r\nHost: {target.netloc}\r\n"
+                           f"Connection: close\r\n\r\n").encode()
+            self._handshake_requests = {settings: request}
+        return request
+
+    def _resolve_proxy_host(self, host):
+        """Адрес хоста прокси: IP используется как есть, имена разрешаются один раз"""
+        try:
+            socket.inet_pton(socket.AF_INET, host)
+            return socket.AF_INET, host
+        except OSError:
+            pass
+        resolved = self._resolved_hosts.get(host)
+        if resolved is None:
+            family, _, _, _, address = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)[0]
+            resolved = self._resolved_hosts[host] = (family, address[0])
+        return resolved
+
+    def _probe_handshake(self, proxy_url, timeout):
+        """Облегченная проверка прокси, возвращает (результат, задержка до строки статуса в мс)"""
+        host, _, port = proxy_key(proxy_url).rpartition(":")
+        sock = None
+        try:
+            family, address = self._resolve_proxy_host(host.strip("[]"))
+            deadline = time.monotonic() + timeout
+            started = time.monotonic()
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect((address, int(port)))
+            request = self._handshake_request()
+            if "@" in proxy_url:
+                request = request[:-2] + self._proxy_authorization(urlsplit(proxy_url)).encode() + b"\r\n"
+            sock.sendall(request)
+            # Нужны только первые байты ответа: "HTTP/1.1 200"
+            head = b""
+            while len(head) < 12:
+                sock.settimeout(max(0.01, deadline - time.monotonic()))
+                chunk = sock.recv(32)
+                if not chunk:
+                    return False, None
+                head += chunk
+            if not head.startswith(b"HTTP/") or head[9:12] != b"200":
+                return False, None
+            return True, round((time.monotonic() - started) * 1000, 1)
+        except (OSError, ValueError, IndexError):
+            return False, None
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _probe_target(self, proxy_url, timeout):
+        """Замер пути до игрового сервера через прокси: туннель CONNECT, TLS и время до первого байта"""
+        target = urlsplit(self.check_target)
+        secure = target.scheme == "https"
+        host = target.hostname
+        port = target.port or (443 if secure else 80)
+        proxy = urlsplit(proxy_url)
+        result = {"ok": False, "connect_ms": None, "tls_ms": None, "ttfb_ms": None}
+
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+        sock = None
+        try:
+            sock = socket.create_connection((proxy.hostname, proxy.port or 80), timeout=timeout)
+            sock.sendall(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                         f"{self._proxy_authorization(proxy)}\r\n".encode())
+            status_line = self._read_response_head(sock, deadline).split(b"\r\n", 1)[0]
+            if status_line.split(b" ", 2)[1:2] != [b"200"]:
+                return result
+            result["connect_ms"] = round((time.monotonic() - started) * 1000, 1)
+
+            if secure:
+                tls_started = time.monotonic()
+                context = ssl.create_default_context()
+                if not self.check_target_verify_tls:
+                    context.check_hostname = False
+                    context.verify_mode = ssl.CERT_NONE
+                sock.settimeout(max(0.01, deadline - time.monotonic()))
+                sock = context.wrap_socket(sock, server_hostname=host)
+                result["tls_ms"] = round((time.monotonic() - tls_started) * 1000, 1)
+
+            request_started = time.monotonic()
+            path = target.path or "/"
+            sock.sendall(f"HEAD {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+            sock.settimeout(max(0.01, deadline - time.monotonic()))
+            first_bytes = sock.recv(16)
+            if not first_bytes.startswith(b"HTTP/"):
+                return result
+            result["ttfb_ms"] = round((time.monotonic() - request_started) * 1000, 1)
+            result["total_ms"] = round((time.monotonic() - started) * 1000, 1)
+            result["ok"] = time.monotonic() <= deadline
+            return result
+        except (OSError, ValueError):
+            return result
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _proxy_authorization(self, proxy):
+        """Заголовок Proxy-Authorization для прокси с учетными данными (proxy - результат urlsplit)"""
+        if not proxy.username:
+            return ""
+        credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+        return f"Proxy-Authorization: Basic {base64.b64encode(credentials.encode()).decode()}\r\n"
+
+    def _probe_socks(self, proxy_url, timeout):
+        """Проверка SOCKS5-прокси: рукопожатие и CONNECT до игрового сервера (или check_url).
+
+        Возвращает (результат, задержка в мс). Используется сырой сокет, поэтому
+        дополнительные библиотеки для SOCKS не нужны.
+        """
+        proxy = urlsplit(proxy_url)
+        target = urlsplit(self.check_target or self.check_url)
+        host = target.hostname.encode("idna")
+        port = target.port or (443 if target.scheme == "https" else 80)
+        deadline = time.monotonic() + timeout
+        started = time.monotonic()
+        sock = None
+        try:
+            sock = socket.create_connection((proxy.hostname, proxy.port or 1080), timeout=timeout)
+            # Предлагаем вход по логину и паролю, только если они заданы
+            sock.sendall(b"\x05\x02\x00\x02" if proxy.username else b"\x05\x01\x00")
+            version, method = self._recv_exact(sock, 2, deadline)
+            if version != 5:
+                return False, None
+            if method == 2 and proxy.username:
+                username = unquote(proxy.username).encode()
+                password = unquote(proxy.password or "").encode()
+                sock.sendall(bytes([1, len(username)]) + username + bytes([len(password)]) + password)
+                if self._recv_exact(sock, 2, deadline)[1] != 0:
+                    return False, None
+            elif method != 0:
+                return False, None
+            sock.sendall(b"\x05\x01\x00\x03" + bytes([len(host)]) + host + port.to_bytes(2, "big"))
+            # Достаточно статуса ответа: 0 - соединение с сервером установлено
+            if self._recv_exact(sock, 2, deadline)[1] != 0:
+                return False, None
+            return True, round((time.monotonic() - started) * 1000, 1)
+        except (OSError, ValueError, IndexError):
+            return False, None
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _recv_exact(self, sock, size, deadline):
+        """Чтение ровно size байт до истечения срока"""
+        data = b""
+        while len(data) < size:
+            sock.settimeout(max(0.01, deadline - time.monotonic()))
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Соединение закрыто прокси")
+            data += chunk
+        return data
+
+    def get_playwright_proxy(self, proxy_url):
+        """Настройки прокси для Playwright: адрес без учетных данных, логин и пароль отдельно.
+
+        Для прокси, с которым Chromium работать не может (SOCKS5 с паролем), возвращает None.
+        """
+        if not browser_supports_proxy(proxy_url):
+            print(f"Chromium не поддерживает SOCKS5-прокси с паролем: {proxy_key(proxy_url)}")
+            return None
+        proxy = urlsplit(proxy_url)
+        # Chromium разрешает имена через SOCKS5-прокси и без явного socks5h
+        scheme = "socks5" if proxy.scheme == "socks5h" else proxy.scheme
+        config = {"server": f"{scheme}://{proxy.hostname}:{proxy.port}"}
+        if proxy.username:
+            config["username"] = unquote(proxy.username)
+            config["password"] = unquote(proxy.password or "")
+        return config
+
+    def _read_response_head(self, sock, deadline):
+        """Чтение заголовков ответа прокси (до пустой строки)"""
+        data = b""
+        while b"\r\n\r\n" not in data:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("Превышено время ожидания ответа прокси")
+            sock.settimeout(remaining)
+            chunk = sock.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+            if len(data) > 8192:
+                break
+        return data
+
+    def _probe_check_url(self, proxy_url, timeout):
+        """Простая проверка прокси запросом к check_url, возвращает (результат, задержка в мс)"""
+        session = self._get_session()
+        started = time.monotonic()
         try:
             proxies = {
                 "http": proxy_url,
                 "https": proxy_url
             }
-            response = requests.get("http://httpbin.org/ip", proxies=proxies, timeout=timeout)
-            return response.status_code == 200
-        except:
-            return False
+            response = session.get(self.check_url, proxies=proxies, timeout=timeout, stream=True)
+            try:
+                ok = response.status_code == 200
+            finally:
+                response.close()
+            elapsed = time.monotonic() - started
+            # Прокси, не уложившийся в отведенное время, считаем нерабочим
+            return ok and elapsed <= timeout, elapsed * 1000
+        except Exception:
+            return False, None
+        finally:
+            # Пул соединений для каждого прокси создается отдельно -
+            # удаляем его, чтобы память не росла с количеством проверенных адресов
+            for adapter in session.adapters.values():
+                while adapter.proxy_manager:
+                    _, manager = adapter.proxy_manager.popitem()
+                    manager.clear()
+
+    def check_proxies(self, proxy_urls, timeout=None, max_workers=None):
+        """Параллельная проверка прокси, возвращает (url, результат, задержка в мс, замеры) по мере готовности"""
+        executor = self._get_executor()
+        # Ограничиваем число одновременных проверок, чтобы не читать весь список в память
+        limit = max(1, min(max_workers or self.max_workers, self.max_workers))
+        pending = {}
+        proxy_iter = iter(proxy_urls)
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) < limit:
+                    try:
+                        proxy_url = next(proxy_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = executor.submit(self._probe_proxy, proxy_url, timeout)
+                    pending[future] = proxy_url
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    proxy_url = pending.pop(future)
+                    try:
+                        result, latency, target = future.result()
+                    except Exception:
+                        result, latency, target = False, None, None
+                    yield proxy_url, result, latency, target
+        finally:
+            # Если потребитель прервал проверку - отменяем еще не начатые задачи
+            for future in pending:
+                future.cancel()
+
+    def _parse_proxy_line(self, line):
+        """Преобразование строки вида ip:port в URL прокси"""
+        line = line.strip()
+        if line.count(':') != 1:
+            return None
+        ip, port = line.split(':')
+        if not ip or not port.isdigit():
+            return None
+        return f"http://{ip}:{port}"
 
     def verify_proxies(self):
         """Проверка всех прокси в списке"""
-        working_proxies = []
+        with self._lock:
+            records = {record.url: record for record in self.proxies}
 
-        for proxy in self.proxies:
-            try:
-                if self.check_proxy(proxy["url"]):
-                    proxy["last_check"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    proxy["working"] = True
-                    working_proxies.append(proxy)
+        for proxy_url, is_working, latency, target in self.check_proxies(list(records)):
+            with self._lock:
+                self._record_check(records[proxy_url], is_working, latency, target)
+
+        # Удаляем только прокси, не прошедшие несколько проверок подряд
+        self._drop_dead_proxies()
+        self.save_proxies()
+
+        working = self.proxies.working_count
+        print(f"Проверено прокси: {working} рабочих")
+        return working
+
+    def _drop_dead_proxies(self):
+        """Удаление прокси, превысивших лимит неудачных проверок подряд"""
+        with self._lock:
+            dropped = 0
+            for record in self.proxies:
+                if record.fail_streak >= self.max_failures:
+                    self.proxies.remove(record.url)
+                    self._mark_dead(record.url)
+                    self._journal_remove(record.url)
+                    dropped += 1
+        if dropped:
+            print(f"Удалено нерабочих прокси: {dropped}")
+            self.save_dead_proxies()
+        return dropped
+
+    def _record_check(self, record, is_working, latency=None, target=None):
+        """Обновление записи о здоровье прокси по результату проверки"""
+        now = time.time()
+        if target is not None:
+            # Замеры пути до игрового сервера
+            record.target_ok = target["ok"]
+            record.connect_ms = target.get("connect_ms")
+            record.tls_ms = target.get("tls_ms")
+            record.ttfb_ms = target.get("ttfb_ms")
+        if is_working and record.breaker_state == "open":
+            if now < record.quarantined_until:
+                # Прокси на карантине не возвращаем в работу до окончания срока
+                record.last_check = now
+                record.next_check = round(record.quarantined_until)
+                return
+            # Карантин истек и пробная проверка прошла - возвращаем прокси на испытание
+            record.breaker_state = "half_open"
+            print(f"Прокси {record.url} возвращен из карантина на испытание")
+        if is_working:
+            record.success += 1
+            record.streak += 1
+            record.fail_streak = 0
+            if latency is not None:
+                add_latency_sample(record, latency, self.latency_sample_size)
+                # Экспоненциальное скользящее среднее задержки
+                if record.latency is None:
+                    record.latency = round(latency, 1)
                 else:
-                    proxy["last_check"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    proxy["working"] = False
+                    record.latency = round(self.latency_alpha * latency
+                                           + (1 - self.latency_alpha) * record.latency, 1)
+            # Чем дольше прокси стабилен, тем реже его перепроверяем
+            ttl = min(self.recheck_max_ttl, self.recheck_base_ttl * 2 ** min(record.streak - 1, 10))
+        else:
+            record.failure += 1
+            record.last_failure = now
+            record.streak = 0
+            record.fail_streak += 1
+            # Повторная проверка с экспоненциальной задержкой
+            ttl = min(self.recheck_max_ttl, self.retry_base_delay * 2 ** min(record.fail_streak - 1, 10))
+        record.next_check = round(now + ttl)
+        record.last_check = now
+        self.proxies.set_working(record, is_working)
+
+    def report_proxy_result(self, proxy_url, stage, success):
+        """Учет результата использования прокси в браузере (stage: preflight, launch, navigation, login)"""
+        affected = None
+        with self._lock:
+            record = self.proxies.get(proxy_url)
+            if record is None:
+                return
+            now = time.time()
+            if success:
+                record.success += 1
+                if record.breaker_state != "closed":
+                    print(f"Прокси {record.url} снова работает нормально")
+                record.breaker_state = "closed"
+                record.breaker_failures = 0
+                record.breaker_trips = 0
+                record.quarantined_until = 0
+            else:
+                record.failure += 1
+                record.last_failure = now
+                record.breaker_failures += 1
+                # Неудача на испытании сразу возвращает прокси в карантин
+                if record.breaker_state == "half_open" or record.breaker_failures >= self.breaker_threshold:
+                    self._open_breaker(record, stage, now)
+                    affected = set(self._proxy_load.get(record.key, ()))
+            self._journal_upsert(record)
+
+        # Перераспределение аккаунтов выполняется вне блокировки пула
+        if affected is not None and self.on_quarantine:
+            try:
+                self.on_quarantine(record.url, affected)
             except Exception as e:
-                print(f"Ошибка при проверке прокси {proxy['url']}: {e}")
-                proxy["working"] = False
+                print(f"Ошибка при перераспределении аккаунтов: {e}")
 
-        # Обновляем список только рабочими прокси
-        self.proxies = working_proxies
-        self.save_proxies(working_proxies)
+    def _open_breaker(self, record, stage, now):
+        """Перевод прокси в карантин с увеличением срока при повторных срабатываниях"""
+        cooldown = min(self.breaker_max_cooldown, self.breaker_cooldown * 2 ** record.breaker_trips)
+        record.breaker_state = "open"
+        record.breaker_trips += 1
+        record.breaker_failures = 0
+        record.quarantined_until = round(now + cooldown)
+        # После карантина прокси пройдет пробную проверку в фоновом планировщике
+        record.next_check = record.quarantined_until
+        self.proxies.set_working(record, False)
+        print(f"Прокси {record.url} отправлен в карантин на {cooldown} с (этап: {stage})")
 
-        print(f"Проверено прокси: {len(self.proxies)} рабочих")
-        return len(working_proxies)
+    def _least_loaded_record(self, exclude=(), assigned=None):
+        """Наименее загруженный рабочий прокси с учетом лимита аккаунтов и оценки прокси"""
+        best = None
+        best_key = None
+        for record in self.proxies.sample_working(self.assignment_sample):
+            if (record.key in exclude or not self._meets_throughput(record, self.min_throughput_kbps)
+                    or not browser_supports_proxy(record.url)):
+                continue
+            load = len(self._proxy_load.get(record.key, set()) | (assigned or {}).get(record.key, set()))
+            if load >= self.max_accounts_per_proxy:
+                continue
+            key = (load, self._proxy_score(record))
+            if best is None or key < best_key:
+                best, best_key = record, key
+        return best
 
-    def get_random_proxy(self):
-        """Получение случайного рабочего прокси"""
-        working_proxies = [p for p in self.proxies if p.get("working", False)]
-        if working_proxies:
-            return random.choice(working_proxies)["url"]
-        else:
-            # Если нет рабочих прокси, попробуем обновить
-            if self.update_proxies(force=True) and self.proxies:
-                return random.choice(self.proxies)["url"]
+    def get_least_loaded_proxy(self, exclude=(), assigned=None):
+        """Получение наименее загруженного рабочего прокси (без закрепления за аккаунтом).
+
+        assigned - host:port -> аккаунты, которым прокси уже назначен, но которые
+        могут быть не запущены; они учитываются в нагрузке вместе с запущенными.
+        """
+        with self._lock:
+            record = self._least_loaded_record({proxy_key(url) for url in exclude}, assigned)
+            return record.url if record else None
+
+    def acquire_proxy(self, username, timeout=0):
+        """Закрепление за запущенным аккаунтом наименее загруженного рабочего прокси.
+
+        Если подходящего прокси нет, ждет его появления не дольше timeout секунд
+        и возвращает None - пул при этом пополняется в фоне, а не в вызывающем потоке.
+        """
+        def pick():
+            record = self._least_loaded_record()
+            if record is not None:
+                self.register_proxy_use(username, record.url)
+                return record.url
+            return None
+
+        with self._lock:
+            self.release_proxy(username)
+            return self._pick_with_deadline(pick, timeout)
+
+    def preflight_proxy(self, proxy_url, timeout=None):
+        """Быстрая проверка доступности прокси (TCP-соединение), возвращает время соединения в мс или None"""
+        proxy = urlsplit(proxy_url)
+        started = time.monotonic()
+        try:
+            with socket.create_connection((proxy.hostname, proxy.port or 80),
+                                          timeout=timeout or self.preflight_timeout):
+                return round((time.monotonic() - started) * 1000, 1)
+        except (OSError, ValueError):
+            return None
+
+    def get_fallback_chain(self, preferred=None, length=None, exclude=()):
+        """Упорядоченная цепочка прокси для запуска: заданный прокси, затем наименее загруженные из пула"""
+        length = length or self.fallback_chain_length
+        chain = [preferred] if preferred else []
+        with self._lock:
+            exclude = {proxy_key(proxy_url) for proxy_url in [*chain, *exclude]}
+            ranked = []
+            for record in self.proxies.sample_working(self.assignment_sample):
+                # Прокси, импортированные до отсева SOCKS5 с паролем, браузеру не выдаются
+                if (record.key in exclude or not self._meets_throughput(record, self.min_throughput_kbps)
+                        or not browser_supports_proxy(record.url)):
+                    continue
+                load = len(self._proxy_load.get(record.key, ()))
+                if load < self.max_accounts_per_proxy:
+                    ranked.append(((load, self._proxy_score(record)), record.url))
+        ranked.sort()
+        chain.extend(proxy_url for _, proxy_url in ranked[:length])
+        return chain
+
+    def select_launch_proxy(self, preferred=None, username=None, timeout=0, exclude=(), pinned=False):
+        """Выбор прокси для запуска браузера: первый прошедший быструю проверку из цепочки.
+
+        Все прокси цепочки проверяются одновременно, а результаты разбираются по
+        порядку цепочки: выбор происходит, как только прошел лучший по рангу прокси,
+        а недоступный основной прокси стоит не больше preflight_timeout. Если указан
+        username, выбранный прокси сразу закрепляется за аккаунтом, если на нем есть место (pinned -
+        основной прокси задан пользователем и лимиту аккаунтов не подчиняется).
+        Прокси из exclude в цепочку не попадают.
+        """
+        if username:
+            self.release_proxy(username)
+        chain = self._pick_with_deadline(lambda: self.get_fallback_chain(preferred, exclude=exclude) or None,
+                                         timeout)
+        if not chain:
+            return None
+
+        executor = self._get_preflight_executor()
+        futures = [executor.submit(self.preflight_proxy, proxy_url) for proxy_url in chain]
+        # Каждое соединение ограничено preflight_timeout; запас - на случай занятого пула проверок
+        deadline = time.monotonic() + self.preflight_timeout * 2
+        try:
+            return self._first_preflighted(chain, futures, deadline, preferred, username, pinned)
+        finally:
+            # Проверки запасных прокси после выбора не нужны
+            for future in futures:
+                future.cancel()
+
+    def _first_preflighted(self, chain, futures, deadline, preferred, username, pinned):
+        """Первый прошедший проверку прокси цепочки: следующий ждем, только если предыдущие не прошли"""
+        for proxy_url, future in zip(chain, futures):
+            try:
+                connect_ms = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # Проверка не успела завершиться - это не повод считать прокси неисправным
+                print(f"Прокси {proxy_url} не успел пройти быструю проверку перед запуском")
+                continue
+            if connect_ms is None:
+                print(f"Прокси {proxy_url} не прошел быструю проверку перед запуском")
+                self.report_proxy_result(proxy_url, "preflight", False)
+                continue
+            if username and not self._reserve_proxy(username, proxy_url,
+                                                    capped=not (pinned and proxy_url == preferred)):
+                # Пока шла проверка, место на прокси занял другой запуск
+                print(f"Прокси {proxy_url} уже занят другими аккаунтами")
+                continue
+            if proxy_url != chain[0]:
+                print(f"Вместо {chain[0]} используется запасной прокси {proxy_url}")
+            return proxy_url
         return None
 
+    def _reserve_proxy(self, username, proxy_url, capped=True):
+        """Закрепление прокси за аккаунтом с повторной проверкой лимита под блокировкой"""
+        with self._lock:
+            if capped and len(self._proxy_load.get(proxy_key(proxy_url), ())) >= self.max_accounts_per_proxy:
+                return False
+            self.register_proxy_use(username, proxy_url)
+            return True
+
+    def register_proxy_use(self, username, proxy_url):
+        """Учет того, что аккаунт работает через указанный прокси"""
+        with self._lock:
+            self.release_proxy(username)
+            key = proxy_key(proxy_url)
+            self._proxy_load.setdefault(key, set()).add(username)
+            self._account_proxy[username] = key
+
+    def transfer_proxy(self, from_username, to_username):
+        """Передача закрепленного прокси от одного ключа другому без освобождения места на прокси"""
+        with self._lock:
+            key = self._account_proxy.get(from_username)
+            self.release_proxy(to_username)
+            if key is None:
+                return
+            users = self._proxy_load.setdefault(key, set())
+            users.discard(from_username)
+            del self._account_proxy[from_username]
+            users.add(to_username)
+            self._account_proxy[to_username] = key
+
+    def release_proxy(self, username):
+        """Снятие нагрузки аккаунта с прокси (при закрытии браузера)"""
+        with self._lock:
+            key = self._account_proxy.pop(username, None)
+            if key is None:
+                return
+            users = self._proxy_load.get(key)
+            if users is not None:
+                users.discard(username)
+                if not users:
+                    del self._proxy_load[key]
+                self._pool_changed.notify_all()
+
+    def get_proxy_load(self, proxy_url):
+        """Количество запущенных аккаунтов, работающих через прокси"""
+        with self._lock:
+            return len(self._proxy_load.get(proxy_key(proxy_url), ()))
+
+    def is_quarantined(self, proxy_url):
+        """Проверка, находится ли прокси на карантине"""
+        with self._lock:
+            record = self.proxies.get(proxy_url)
+            return (record is not None and record.breaker_state == "open"
+                    and record.quarantined_until > time.time())
+
+    def start_background_verification(self):
+        """Запуск фоновой перепроверки прокси по истечении их TTL"""
+        if self._scheduler_thread and self._scheduler_thread.is_alive():
+            return
+        self._scheduler_stop.clear()
+        self._scheduler_thread = threading.Thread(target=self._scheduler_loop, name="proxy-scheduler", daemon=True)
+        self._scheduler_thread.start()
+
+    def stop_background_verification(self):
+        """Остановка фоновой перепроверки прокси"""
+        self._scheduler_stop.set()
+        if self._scheduler_thread:
+            self._scheduler_thread.join(timeout=self.check_timeout * 2)
+            self._scheduler_thread = None
+
+    def _scheduler_loop(self):
+        """Цикл фоновой перепроверки: небольшие пакеты прокси с ограничением скорости"""
+        while not self._scheduler_stop.wait(self.recheck_interval):
+            try:
+                self._refill_if_low()
+                now = time.time()
+                batch_size = max(1, int(self.recheck_rate * self.recheck_interval))
+                with self._lock:
+                    due = [record for record in self.proxies if record.next_check <= now]
+                if not due:
+                    continue
+
+                # В первую очередь проверяем прокси, которые дольше всего ждут проверки
+                due.sort(key=lambda record: record.next_check)
+                batch = {record.url: record for record in due[:batch_size]}
+                for proxy_url, is_working, latency, target in self.check_proxies(list(batch),
+                                                                                  max_workers=batch_size):
+                    with self._lock:
+                        record = batch[proxy_url]
+                        self._record_check(record, is_working, latency, target)
+                        # Прокси мог быть удален из пула, пока шла проверка
+                        if record.url in self.proxies:
+                            self._journal_upsert(record)
+
+                # Сохраняются только изменения - объем записи не зависит от размера пула
+                self._drop_dead_proxies()
+
+                if self.throughput_checks:
+                    # Замер скорости - только для нескольких лучших прокси за один проход
+                    self.measure_pool_throughput(limit=self.throughput_workers)
+            except Exception as e:
+                print(f"Ошибка фоновой проверки прокси: {e}")
+
+    def measure_throughput(self, proxy_url, size=None, timeout=None):
+        """Замер устойчивой скорости загрузки через прокси (КБ/с), результат сохраняется в записи"""
+        size = size or self.throughput_size
+        timeout = timeout or self.throughput_timeout
+        session = self._get_session()
+        kbps = None
+        try:
+            proxies = {"http": proxy_url, "https": proxy_url}
+            url = self.throughput_url.format(size=size)
+            deadline = time.monotonic() + timeout
+            with session.get(url, proxies=proxies, timeout=self.check_timeout, stream=True) as response:
+                if response.status_code == 200:
+                    # Время до первого байта не учитываем - оно уже отражено в задержке
+                    first_byte = None
+                    received = 0
+                    for chunk in response.iter_content(chunk_size=16384):
+                        if first_byte is None:
+                            first_byte = time.monotonic()
+                        received += len(chunk)
+                        if time.monotonic() > deadline:
+                            break
+                    if first_byte is not None and received > 16384:
+                        elapsed = max(time.monotonic() - first_byte, 0.001)
+                        kbps = round(received / 1024 / elapsed, 1)
+        except Exception as e:
+            print(f"Ошибка замера скорости прокси {proxy_url}: {e}")
+        finally:
+            for adapter in session.adapters.values():
+                while adapter.proxy_manager:
+                    _, manager = adapter.proxy_manager.popitem()
+                    manager.clear()
+
+        with self._lock:
+            record = self.proxies.get(proxy_url)
+            if record is not None:
+                record.throughput_kbps = kbps
+                record.throughput_checked = time.time()
+                self._journal_upsert(record)
+        return kbps
+
+    def measure_pool_throughput(self, limit=None, max_age=None):
+        """Замер скорости рабочих прокси, у которых замер отсутствует или устарел"""
+        max_age = self.throughput_ttl if max_age is None else max_age
+        now = time.time()
+        with self._lock:
+            records = [record for record in self.proxies
+                       if record.working and now - (record.throughput_checked or 0) >= max_age]
+        records.sort(key=self._proxy_score)
+        if limit:
+            records = records[:limit]
+        if not records:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.throughput_workers, thread_name_prefix="proxy-speed") as executor:
+            results = list(executor.map(self.measure_throughput, [record.url for record in records]))
+        measured = sum(1 for kbps in results if kbps is not None)
+        print(f"Замерена скорость {measured} прокси из {len(records)}")
+        return measured
+
+    def _proxy_score(self, record):
+        """Оценка прокси: ожидаемое время работы через прокси с поправкой на надежность (меньше - лучше)"""
+        latency = record.latency
+        if latency is None:
+            # Для непроверенных прокси считаем задержку средней
+            latency = self.check_timeout * 500
+        # Доля успешных проверок со сглаживанием, чтобы новые прокси не получали крайних оценок
+        success_rate = (record.success + 1) / (record.success + record.failure + 2)
+        score = latency / success_rate
+        if record.throughput_kbps:
+            # Время загрузки игры через прокси с известной скоростью (мс)
+            score += self.game_payload_kb / record.throughput_kbps * 1000
+        if record.last_failure and time.time() - record.last_failure < 600:
+            score *= 2
+        return score
+
+    def _meets_throughput(self, record, min_kbps):
+        """Проверка минимальной скорости (прокси без замера проходят, пока замер не выполнен)"""
+        return not min_kbps or record.throughput_kbps is None or record.throughput_kbps >= min_kbps
+
+    def get_random_proxy(self, min_kbps=None, timeout=0):
+        """Получение рабочего прокси: лучший по оценке из нескольких случайных.
+
+        Не обновляет пул в вызывающем потоке: при нехватке прокси запускается фоновое
+        пополнение, а вызов ждет не дольше timeout секунд и может вернуть None.
+        """
+        min_kbps = min_kbps or self.min_throughput_kbps
+
+        def pick():
+            if min_kbps:
+                # При фильтре по скорости выборка шире, чтобы после отсева осталось из чего выбирать
+                sample = [record for record in self.proxies.sample_working(self.assignment_sample)
+                          if self._meets_throughput(record, min_kbps)][:self.selection_k]
+            else:
+                sample = self.proxies.sample_working(self.selection_k)
+            return min(sample, key=self._proxy_score).url if sample else None
+
+        return self._pick_with_deadline(pick, timeout)
+
     def get_user_agents(self):
         """Возвращает список популярных User-Agent строк для эмуляции разных браузеров"""
         return [
@@ -181,6 +1383,19 @@ class ProxyManager:
         """Получение случайного User-Agent"""
         return random.choice(self.user_agents)
 
+    def get_account_profile(self, username):
+        """Постоянный профиль браузера аккаунта: одинаковый для одного логина при каждом вызове"""
+        rng = random.Random(username)
+        # Браузер запускается на Chromium, поэтому берем только настольные User-Agent на его основе,
+        # чтобы заголовок не противоречил остальным признакам браузера
+        user_agents = [ua for ua in self.user_agents
+                       if "Chrome/" in ua and "Mobile" not in ua] or self.user_agents
+        return {
+            "user_agent": rng.choice(user_agents),
+            "viewport": dict(rng.choice(self.viewports)),
+            "proxy": None
+        }
+
     def get_browser_profile(self):
         """Возвращает случайный профиль для браузера (прокси + User-Agent)"""
         return {
@@ -189,25 +1404,94 @@ class ProxyManager:
         }
 
     def add_manual_proxy(self, proxy_url, proxy_type="http"):
-        """Добавление прокси вручную"""
-        if self.check_proxy(proxy_url):
-            new_proxy = {
-                "url": proxy_url,
-                "type": proxy_type,
-                "source": "manual",
-                "added": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "last_check": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "working": True
-            }
-            self.proxies.append(new_proxy)
-            self.save_proxies(self.proxies)
+        """Добавление прокси вручную (форматы те же, что и при импорте)"""
+        proxy_url = parse_proxy_url(proxy_url, proxy_type)
+        if proxy_url is None:
+            print("Неверный формат прокси")
+            return False
+        if not browser_supports_proxy(proxy_url):
+            print("Chromium не поддерживает SOCKS5-прокси с паролем, прокси не добавлен")
+            return False
+        _, is_working, latency, target = next(self.check_proxies([proxy_url]))
+        if is_working:
+            # Повторно добавленный адрес не дублируется, а обновляется
+            self._publish_proxy(proxy_url, "manual", latency, target)
             return True
         return False
 
-    def get_proxy_stats(self):
-        """Получение статистики по прокси"""
-        return {
+    def import_proxies(self, lines, proxy_type="http", source="manual"):
+        """Массовый импорт прокси из файла (путь) или списка строк.
+
+        Строки разбираются и проверяются параллельно по мере чтения, рабочие прокси
+        сразу попадают в пул. Форматы: ip:port, ip:port:user:pass, user:pass@ip:port
+        и URL (http, https, socks5). SOCKS5 с логином и паролем Chromium не
+        поддерживает - такие строки пропускаются. Возвращает статистику импорта
+        (при ошибке чтения файла - с ее описанием в "error").
+        """
+        stats = {"lines": 0, "invalid": 0, "unsupported": 0, "duplicates": 0, "working": 0, "failed": 0}
+
+        def candidates():
+            seen = set()
+            # utf-8-sig: метка BOM в начале файла не попадает в адрес первого прокси
+            file = open(lines, 'r', encoding='utf-8-sig') if isinstance(lines, str) else None
+            try:
+                for line in (file if file is not None else lines):
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    stats["lines"] += 1
+                    proxy_url = parse_proxy_url(line, proxy_type)
+                    if proxy_url is None:
+                        stats["invalid"] += 1
+                        continue
+                    if not browser_supports_proxy(proxy_url):
+                        stats["unsupported"] += 1
+                        continue
+                    key = proxy_key(proxy_url)
+                    if key in seen:
+                        stats["duplicates"] += 1
+                        continue
+                    seen.add(key)
+                    yield proxy_url
+            finally:
+                if file is not None:
+                    file.close()
+
+        try:
+            for proxy_url, is_working, latency, target in self.check_proxies(candidates()):
+                if is_working:
+                    self._publish_proxy(proxy_url, source, latency, target)
+                    stats["working"] += 1
+                    continue
+                stats["failed"] += 1
+                with self._lock:
+                    record = self.proxies.get(proxy_url)
+                    if record is not None:
+                        self._record_check(record, False, target=target)
+                        self._journal_upsert(record)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Ошибка при чтении списка прокси: {e}")
+            stats["error"] = str(e)
+        self.save_proxies()
+        print(f"Импорт прокси: строк {stats['lines']}, рабочих {stats['working']}, нерабочих {stats['failed']}, "
+              f"с ошибкой формата {stats['invalid']}, SOCKS5 с паролем {stats['unsupported']}, "
+              f"повторов {stats['duplicates']}")
+        return stats
+
+    def get_proxy_stats(self, min_kbps=None, top=0):
+        """Получение статистики по прокси (по запросу - с отбором и рейтингом по скорости)"""
+        stats = {
             "total": len(self.proxies),
-            "working": len([p for p in self.proxies if p.get("working", False)]),
+            "working": self.proxies.working_count,
             "last_update": self.last_update.strftime("%Y-%m-%d %H:%M:%S") if self.last_update else None
-        }
\ No newline at end of file
+        }
+        if min_kbps or top:
+            # Требует прохода по пулу, поэтому считается только по запросу
+            with self._lock:
+                measured = [record for record in self.proxies if record.working and record.throughput_kbps]
+            if min_kbps:
+                stats["fast"] = sum(1 for record in measured if record.throughput_kbps >= min_kbps)
+            if top:
+                measured.sort(key=lambda record: record.throughput_kbps, reverse=True)
+                stats["top_by_throughput"] = [(record.url, record.throughput_kbps) for record in measured[:top]]
+        return stats
\ No newline at end of file
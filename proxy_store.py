@@ -0,0 +1,423 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from array import array
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+# Схемы прокси, которые принимаются при импорте
+PROXY_SCHEMES = ("http", "https", "socks5", "socks5h")
+
+
+def proxy_key(proxy_url):
+    """Ключ прокси вида host:port (без схемы и учетных данных)"""
+    address = proxy_url.split("://", 1)[-1]
+    return address.rsplit("@", 1)[-1].rstrip("/")
+
+
+def parse_proxy_url(line, default_scheme="http"):
+    """Приведение строки с прокси к URL.
+
+    Принимаются ip:port, ip:port:user:pass, user:pass@ip:port и
+    scheme://[user:pass@]host:port; для нераспознанной строки возвращается None.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    scheme = default_scheme
+    credentials = ""
+    parts = line.split(":")
+    if "://" not in line and len(parts) == 4 and parts[1].isdigit():
+        # ip:port:user:pass - логин и пароль могут содержать символы, недопустимые в URL
+        host, port, username, password = parts
+        credentials = f"{quote(username, safe='')}:{quote(password, safe='')}@"
+    else:
+        if "://" in line:
+            scheme, line = line.split("://", 1)
+            scheme = scheme.lower()
+        if "@" in line:
+            credentials, line = line.rsplit("@", 1)
+            if ":" not in credentials:
+                return None
+            # Кодируем так же, как в форме ip:port:user:pass; уже закодированные данные не кодируются повторно
+            username, password = credentials.split(":", 1)
+            credentials = f"{quote(unquote(username), safe='')}:{quote(unquote(password), safe='')}@"
+        parts = line.rstrip("/").split(":")
+        if len(parts) != 2:
+            return None
+        host, port = parts
+    if scheme not in PROXY_SCHEMES or not host or not port.isdigit() or not 0 < int(port) < 65536:
+        return None
+    return f"{scheme}://{credentials}{host}:{port}"
+
+
+def browser_supports_proxy(proxy_url):
+    """Может ли Chromium работать через прокси: SOCKS5 с логином и паролем он не поддерживает"""
+    return not (proxy_url.startswith("socks") and "@" in proxy_url)
+
+
+def add_latency_sample(record, latency, limit):
+    """Добавление задержки (мс) в кольцо последних замеров записи"""
+    samples = record.latency_samples
+    if samples is None:
+        # Компактный массив: 2 байта на замер вместо объекта float
+        record.latency_samples = samples = array("H")
+    samples.append(min(int(latency), 65535))
+    if len(samples) > limit:
+        del samples[0]
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _parse_time(value):
+    """Преобразование времени из JSON (число или строка старого формата) в timestamp"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+
+class ProxyRecord:
+    """Компактная запись о прокси и его здоровье"""
+
+    __slots__ = ("key", "url", "type", "source", "added", "last_check", "working",
+                 "latency", "success", "failure", "last_failure", "streak", "fail_streak", "next_check",
+                 "breaker_state", "breaker_failures", "breaker_trips", "quarantined_until",
+                 "target_ok", "connect_ms", "tls_ms", "ttfb_ms", "throughput_kbps", "throughput_checked",
+                 "latency_samples")
+
+    def __init__(self, url, proxy_type="http", source=None, added=None):
+        self.key = proxy_key(url)
+        self.url = url
+        self.type = sys.intern(proxy_type)
+        # Источников немного - храним одну копию строки на все записи
+        self.source = sys.intern(source) if source else source
+        self.added = added if added is not None else time.time()
+        self.last_check = None
+        self.working = False
+        self.latency = None  # Скользящее среднее задержки (мс)
+        self.latency_samples = None  # Последние задержки успешных проверок (мс, array('H'))
+        self.success = 0
+        self.failure = 0
+        self.last_failure = None
+        self.streak = 0  # Успешных проверок подряд
+        self.fail_streak = 0  # Неудачных проверок подряд
+        self.next_check = 0
+        # Предохранитель по результатам реального использования в браузере
+        self.breaker_state = "closed"  # closed / open (карантин) / half_open (пробный возврат)
+        self.breaker_failures = 0  # Неудач использования подряд
+        self.breaker_trips = 0  # Сколько раз подряд прокси уходил в карантин
+        self.quarantined_until = 0
+        # Замеры пути до игрового сервера (туннель CONNECT, TLS, время до первого байта; мс)
+        self.target_ok = None
+        self.connect_ms = None
+        self.tls_ms = None
+        self.ttfb_ms = None
+        # Устойчивая скорость загрузки через прокси (КБ/с) и время замера
+        self.throughput_kbps = None
+        self.throughput_checked = None
+
+    def to_dict(self):
+        """Представление записи для сохранения в JSON"""
+        return {
+            "url": self.url,
+            "type": self.type,
+            "source": self.source,
+            "added": self.added,
+            "last_check": self.last_check,
+            "working": self.working,
+            "health": {
+                "latency": self.latency,
+                "samples": list(self.latency_samples) if self.latency_samples else [],
+                "success": self.success,
+                "failure": self.failure,
+                "last_failure": self.last_failure,
+                "streak": self.streak,
+                "fail_streak": self.fail_streak,
+                "next_check": self.next_check
+            },
+            "breaker": {
+                "state": self.breaker_state,
+                "failures": self.breaker_failures,
+                "trips": self.breaker_trips,
+                "until": self.quarantined_until
+            },
+            "target": {
+                "ok": self.target_ok,
+                "connect_ms": self.connect_ms,
+                "tls_ms": self.tls_ms,
+                "ttfb_ms": self.ttfb_ms
+            },
+            "throughput": {
+                "kbps": self.throughput_kbps,
+                "checked": self.throughput_checked
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстановление записи из JSON (поддерживается и старый формат со строковыми датами)"""
+        record = cls(data["url"], data.get("type", "http"), data.get("source"), _parse_time(data.get("added")))
+        record.last_check = _parse_time(data.get("last_check"))
+        record.working = bool(data.get("working", False))
+        health = data.get("health") or {}
+        record.latency = health.get("latency")
+        if health.get("samples"):
+            record.latency_samples = array("H", health["samples"])
+        record.success = health.get("success", 0)
+        record.failure = health.get("failure", 0)
+        record.last_failure = _parse_time(health.get("last_failure"))
+        record.streak = health.get("streak", 0)
+        record.fail_streak = health.get("fail_streak", 0)
+        record.next_check = health.get("next_check", 0)
+        breaker = data.get("breaker") or {}
+        record.breaker_state = breaker.get("state", "closed")
+        record.breaker_failures = breaker.get("failures", 0)
+        record.breaker_trips = breaker.get("trips", 0)
+        record.quarantined_until = breaker.get("until", 0)
+        target = data.get("target") or {}
+        record.target_ok = target.get("ok")
+        record.connect_ms = target.get("connect_ms")
+        record.tls_ms = target.get("tls_ms")
+        record.ttfb_ms = target.get("ttfb_ms")
+        throughput = data.get("throughput") or {}
+        record.throughput_kbps = throughput.get("kbps")
+        record.throughput_checked = throughput.get("checked")
+        return record
+
+
+class ProxyStore:
+    """Пул прокси с уникальным индексом по host:port и отдельным набором рабочих.
+
+    Добавление, удаление, смена статуса и случайная выборка рабочих прокси
+    выполняются за O(1). Синхронизация потоков - на стороне вызывающего кода.
+    """
+
+    def __init__(self, records=()):
+        self._records = {}  # host:port -> ProxyRecord
+        self._working = []  # Рабочие записи (для случайной выборки)
+        self._working_pos = {}  # host:port -> позиция в self._working
+        self._source_counts = {}
+        for record in records:
+            self.add(record)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(list(self._records.values()))
+
+    def __contains__(self, proxy_url):
+        return proxy_key(proxy_url) in self._records
+
+    @property
+    def working_count(self):
+        return len(self._working)
+
+    def get(self, proxy_url):
+        """Поиск записи по URL или ключу host:port"""
+        return self._records.get(proxy_key(proxy_url))
+
+    def add(self, record):
+        """Добавление записи; если такой host:port уже есть, возвращается существующая"""
+        existing = self._records.get(record.key)
+        if existing is not None:
+            return existing
+        self._records[record.key] = record
+        self._source_counts[record.source] = self._source_counts.get(record.source, 0) + 1
+        if record.working:
+            self._add_working(record)
+        return record
+
+    def remove(self, proxy_url):
+        """Удаление записи из пула"""
+        record = self._records.pop(proxy_key(proxy_url), None)
+        if record is None:
+            return None
+        self._remove_working(record)
+        count = self._source_counts.get(record.source, 0) - 1
+        if count > 0:
+            self._source_counts[record.source] = count
+        else:
+            self._source_counts.pop(record.source, None)
+        return record
+
+    def set_working(self, record, working):
+        """Смена статуса записи с обновлением набора рабочих"""
+        record.working = working
+        if record.key not in self._records:
+            return
+        if working:
+            self._add_working(record)
+        else:
+            self._remove_working(record)
+
+    def sample_working(self, k):
+        """Случайная выборка до k рабочих записей"""
+        return random.sample(self._working, min(k, len(self._working)))
+
+    def count_source(self, source):
+        """Количество записей из указанного источника"""
+        return self._source_counts.get(source, 0)
+
+    def to_list(self):
+        """Список записей в виде словарей для сохранения"""
+        return [record.to_dict() for record in self._records.values()]
+
+    def _add_working(self, record):
+        if record.key not in self._working_pos:
+            self._working_pos[record.key] = len(self._working)
+            self._working.append(record)
+
+    def _remove_working(self, record):
+        position = self._working_pos.pop(record.key, None)
+        if position is None:
+            return
+        # Переносим последний элемент на место удаляемого, чтобы удаление было O(1)
+        last = self._working.pop()
+        if last is not record:
+            self._working[position] = last
+            self._working_pos[last.key] = position
+
+
+def write_json_atomic(path, data, indent=None):
+    """Атомарная запись JSON: во временный файл рядом с целевым, затем переименование"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=indent,
+                      separators=None if indent else (",", ":"))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ProxyJournal:
+    """Снимок пула (JSON) и журнал отдельных изменений с построчной записью.
+
+    Состояние восстанавливается как снимок + изменения из журнала. При
+    компактизации журнал сначала переименовывается, затем атомарно пишется
+    новый снимок, и только после этого старый журнал удаляется - сбой на
+    любом шаге не приводит к потере данных.
+    """
+
+    def __init__(self, snapshot_path):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.rotated_path = self.journal_path + ".old"
+        self.entries = 0  # Количество записей в текущем журнале
+        self._file = None
+
+    def load(self):
+        """Чтение снимка и списка изменений из журналов"""
+        snapshot = {}
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as file:
+                    snapshot = json.load(file)
+            except ValueError as e:
+                # Поврежденный снимок не мешает применить журнал
+                print(f"Не удалось прочитать снимок прокси: {e}")
+                self.set_aside_snapshot()
+                snapshot = {}
+            if not isinstance(snapshot, dict):
+                print("Неверный формат снимка прокси")
+                self.set_aside_snapshot()
+                snapshot = {}
+
+        operations = []
+        for path in (self.rotated_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            # Недописанная при сбое строка отрезается, чтобы следующая запись не склеилась с ней
+            self._truncate_torn_tail(path)
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        operations.append(json.loads(line))
+                    except ValueError:
+                        # Последняя строка могла быть записана не полностью при сбое
+                        continue
+        self.entries = len(operations)
+        return snapshot, operations
+
+    @staticmethod
+    def _truncate_torn_tail(path, chunk_size=4096):
+        """Обрезка журнала до последнего перевода строки"""
+        with open(path, 'rb+') as file:
+            end = file.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - chunk_size)
+                file.seek(start)
+                newline = file.read(position - start).rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position != end:
+                print(f"Журнал прокси {path}: отброшена недописанная запись ({end - position} байт)")
+                file.truncate(position)
+
+    def set_aside_snapshot(self):
+        """Перенос нечитаемого снимка в отдельный файл, чтобы следующее сохранение его не затерло"""
+        if not os.path.exists(self.snapshot_path):
+            return None
+        broken_path = f"{self.snapshot_path}.broken-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(broken_path):
+            broken_path = f"{self.snapshot_path}.broken-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+        try:
+            os.replace(self.snapshot_path, broken_path)
+            print(f"Поврежденный снимок прокси сохранен как {broken_path}")
+            return broken_path
+        except OSError as e:
+            print(f"Не удалось отложить поврежденный снимок прокси: {e}")
+            return None
+
+    def append(self, operation):
+        """Добавление изменения в журнал"""
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(operation, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.entries += 1
+
+    def rotate(self):
+        """Отделение текущего журнала перед записью нового снимка"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.rotated_path):
+                # Предыдущая компактизация не завершилась - дописываем журнал к старому
+                with open(self.journal_path, 'r', encoding='utf-8') as source, \
+                        open(self.rotated_path, 'a', encoding='utf-8') as target:
+                    target.write(source.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.rotated_path)
+        self.entries = 0
+
+    def write_snapshot(self, data):
+        """Атомарная запись снимка и удаление уже учтенного в нем журнала"""
+        write_json_atomic(self.snapshot_path, data)
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)